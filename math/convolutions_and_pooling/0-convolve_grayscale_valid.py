@@ -3,32 +3,28 @@
 
 import numpy as np
 
+conv2d = __import__('conv_engine').conv2d
 
-def convolve_grayscale_valid(images, kernel):
+
+def convolve_grayscale_valid(images, kernel, method='auto',
+                             workspace=None, dtype=None):
     """
     Performs a valid convolution on grayscale images
 
     Args:
         images: numpy.ndarray of shape (m, h, w)
         kernel: numpy.ndarray of shape (kh, kw)
+        method: 'auto', 'direct', 'im2col' or 'fft' convolution backend
+        workspace: optional Workspace reused for the padded images
+        dtype: dtype of the result, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
 
     Returns:
         numpy.ndarray containing convolved images
     """
-    m, h, w = images.shape
-    kh, kw = kernel.shape
-
-    # Output dimensions
-    output_h = h - kh + 1
-    output_w = w - kw + 1
-
-    # Initialize output
-    output = np.zeros((m, output_h, output_w))
-
-    # Only TWO loops
-    for i in range(output_h):
-        for j in range(output_w):
-            region = images[:, i:i+kh, j:j+kw]
-            output[:, i, j] = np.sum(region * kernel, axis=(1, 2))
+    # Single channel, single kernel convolution
+    output = conv2d(images[..., np.newaxis],
+                    kernel[..., np.newaxis, np.newaxis], method=method,
+                    workspace=workspace, dtype=dtype)
 
-    return output
+    return output[..., 0]
@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+convolve_grayscale_same = __import__(
+    '1-convolve_grayscale_same').convolve_grayscale_same
+Workspace = __import__('conv_engine').Workspace
+
+rng = np.random.default_rng(0)
+a = rng.random((4, 10, 10))
+b = rng.random((4, 8, 8))
+k3 = rng.random((3, 3))
+k5 = rng.random((5, 5))
+
+# Both calls pad to 12x12; the second must not see the first's data
+ws = Workspace()
+convolve_grayscale_same(a, k3, workspace=ws)
+print(np.allclose(convolve_grayscale_same(b, k5, workspace=ws),
+                  convolve_grayscale_same(b, k5)))
@@ -3,8 +3,11 @@
 
 import numpy as np
 
+conv2d = __import__('conv_engine').conv2d
 
-def convolve_grayscale_padding(images, kernel, padding):
+
+def convolve_grayscale_padding(images, kernel, padding, method='auto',
+                               workspace=None, dtype=None):
     """
     Performs a convolution on grayscale images with custom padding
 
@@ -12,30 +15,19 @@ def convolve_grayscale_padding(images, kernel, padding):
         images: numpy.ndarray of shape (m, h, w)
         kernel: numpy.ndarray of shape (kh, kw)
         padding: tuple (ph, pw)
+        method: 'auto', 'direct', 'im2col' or 'fft' convolution backend
+        workspace: optional Workspace reused for the padded images
+        dtype: dtype of the result, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
 
     Returns:
         numpy.ndarray containing convolved images
     """
-    m, h, w = images.shape
-    kh, kw = kernel.shape
     ph, pw = padding
 
-    # Pad images
-    padded = np.pad(images,
-                    ((0, 0), (ph, ph), (pw, pw)),
-                    mode='constant')
-
-    # Output dimensions
-    output_h = h + 2 * ph - kh + 1
-    output_w = w + 2 * pw - kw + 1
-
-    # Initialize output
-    output = np.zeros((m, output_h, output_w))
-
-    # Only TWO loops
-    for i in range(output_h):
-        for j in range(output_w):
-            region = padded[:, i:i+kh, j:j+kw]
-            output[:, i, j] = np.sum(region * kernel, axis=(1, 2))
+    output = conv2d(images[..., np.newaxis],
+                    kernel[..., np.newaxis, np.newaxis],
+                    padding=(ph, pw), method=method,
+                    workspace=workspace, dtype=dtype)
 
-    return output
+    return output[..., 0]
@@ -3,8 +3,12 @@
 
 import numpy as np
 
+conv2d = __import__('conv_engine').conv2d
 
-def convolve_grayscale(images, kernel, padding='same', stride=(1, 1)):
+
+def convolve_grayscale(images, kernel,
+                       padding='same', stride=(1, 1), method='auto',
+                       workspace=None, dtype=None):
     """
     Performs a convolution on grayscale images
 
@@ -13,6 +17,10 @@ def convolve_grayscale(images, kernel, padding='same', stride=(1, 1)):
         kernel: (kh, kw)
         padding: 'same', 'valid', or (ph, pw)
         stride: (sh, sw)
+        method: 'auto', 'direct', 'im2col' or 'fft' convolution backend
+        workspace: optional Workspace reused for the padded images
+        dtype: dtype of the result, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
 
     Returns:
         convolved images
@@ -30,24 +38,10 @@ def convolve_grayscale(images, kernel, padding='same', stride=(1, 1)):
     else:
         ph, pw = padding
 
-    # Pad images
-    padded = np.pad(images,
-                    ((0, 0), (ph, ph), (pw, pw)),
-                    mode='constant')
-
-    # Output dimensions
-    output_h = (h + 2 * ph - kh) // sh + 1
-    output_w = (w + 2 * pw - kw) // sw + 1
-
-    output = np.zeros((m, output_h, output_w))
-
-    # --- Convolution (ONLY 2 loops) ---
-    for i in range(output_h):
-        for j in range(output_w):
-            row = i * sh
-            col = j * sw
-
-            region = padded[:, row:row+kh, col:col+kw]
-            output[:, i, j] = np.sum(region * kernel, axis=(1, 2))
+    # --- Convolution ---
+    output = conv2d(images[..., np.newaxis],
+                    kernel[..., np.newaxis, np.newaxis],
+                    padding=(ph, pw), stride=(sh, sw), method=method,
+                    workspace=workspace, dtype=dtype)
 
-    return output
+    return output[..., 0]
@@ -3,8 +3,11 @@
 
 import numpy as np
 
+conv2d = __import__('conv_engine').conv2d
 
-def convolve(images, kernels, padding='same', stride=(1, 1)):
+
+def convolve(images, kernels, padding='same', stride=(1, 1), method='auto',
+             workspace=None, dtype=None):
     """
     Performs a convolution on images using multiple kernels
 
@@ -13,6 +16,10 @@ def convolve(images, kernels, padding='same', stride=(1, 1)):
         kernels: (kh, kw, c, nc)
         padding: 'same', 'valid', or (ph, pw)
         stride: (sh, sw)
+        method: 'auto', 'direct', 'im2col' or 'fft' convolution backend
+        workspace: optional Workspace reused for the padded images
+        dtype: dtype of the result, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
 
     Returns:
         convolved images: (m, output_h, output_w, nc)
@@ -34,31 +41,7 @@ def convolve(images, kernels, padding='same', stride=(1, 1)):
     else:
         ph, pw = padding
 
-    # Pad images
-    padded = np.pad(
-        images,
-        ((0, 0), (ph, ph), (pw, pw), (0, 0)),
-        mode='constant'
-    )
-
-    # Output dimensions
-    output_h = (h + 2 * ph - kh) // sh + 1
-    output_w = (w + 2 * pw - kw) // sw + 1
-
-    output = np.zeros((m, output_h, output_w, nc))
-
     # --- Convolution ---
-    for i in range(output_h):
-        for j in range(output_w):
-            row = i * sh
-            col = j * sw
-
-            region = padded[:, row:row+kh, col:col+kw, :]  # (m, kh, kw, c)
-
-            # Broadcast + sum
-            output[:, i, j, :] = np.sum(
-                region[..., np.newaxis] * kernels,
-                axis=(1, 2, 3)
-            )
-
-    return output
+    return conv2d(images, kernels,
+                  padding=(ph, pw), stride=(sh, sw), method=method,
+                  workspace=workspace, dtype=dtype)
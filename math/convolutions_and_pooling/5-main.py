@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+convolve = __import__('5-convolve').convolve
+choose_method = __import__('conv_engine').choose_method
+
+# Ordinary multi-channel layers stay on the spatial backends
+for images_shape, kernels_shape in [((8, 224, 224, 64), (3, 3, 64, 64)),
+                                    ((8, 56, 56, 128), (3, 3, 128, 128)),
+                                    ((4, 56, 56, 64), (5, 5, 64, 64)),
+                                    ((4, 96, 96, 3), (5, 5, 3, 16))]:
+    kh, kw = kernels_shape[:2]
+    method = choose_method(images_shape, kernels_shape, (kh // 2, kw // 2))
+    print(kernels_shape, method, method != 'fft')
+
+# Large kernels over few channels go to the FFT
+print(choose_method((4, 128, 128, 1), (15, 15, 1, 1), (7, 7)))
+
+rng = np.random.default_rng(0)
+images = rng.random((2, 16, 16, 8))
+kernels = rng.random((3, 3, 8, 4))
+print(convolve(images, kernels, padding='same').shape)
@@ -3,8 +3,11 @@
 
 import numpy as np
 
+pool_windows = __import__('conv_engine').pool_windows
+resolve_dtype = __import__('conv_engine').resolve_dtype
 
-def pool(images, kernel_shape, stride, mode='max'):
+
+def pool(images, kernel_shape, stride, mode='max', dtype=None):
     """
     Performs pooling on images
 
@@ -13,31 +16,19 @@ def pool(images, kernel_shape, stride, mode='max'):
         kernel_shape: (kh, kw)
         stride: (sh, sw)
         mode: 'max' or 'avg'
+        dtype: dtype of the result, by default that of the images;
+               float16 averages are accumulated in float32
 
     Returns:
         numpy.ndarray containing pooled images
     """
-    m, h, w, c = images.shape
-    kh, kw = kernel_shape
-    sh, sw = stride
-
-    # Output dimensions
-    output_h = (h - kh) // sh + 1
-    output_w = (w - kw) // sw + 1
-
-    output = np.zeros((m, output_h, output_w, c))
-
-    # ONLY 2 LOOPS
-    for i in range(output_h):
-        for j in range(output_w):
-            row = i * sh
-            col = j * sw
-
-            region = images[:, row:row+kh, col:col+kw, :]
+    dtype, acc = resolve_dtype(dtype, images)
+    windows = pool_windows(images, kernel_shape, stride)
 
-            if mode == 'max':
-                output[:, i, j, :] = np.max(region, axis=(1, 2))
-            else:  # avg
-                output[:, i, j, :] = np.mean(region, axis=(1, 2))
+    # Reduce every window at once
+    if mode == 'max':
+        output = np.max(windows, axis=(4, 5))
+    else:  # avg
+        output = np.mean(windows, axis=(4, 5), dtype=acc)
 
-    return output
+    return output.astype(dtype, copy=False)
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+"""Convolution engine shared by the convolution functions
+
+Three interchangeable backends compute the same (unflipped) convolution:
+    direct: one GEMM over the channels per kernel offset
+    im2col: a single GEMM over every window at once
+    fft: channel-mixed products of rfft2 tiles, combined by overlap-add
+conv2d picks one of them from a cost model
+
+Workspace, pad_images, resolve_dtype and pool_windows mirror Workspace,
+pad, resolve_dtype and pool_windows of supervised_learning/cnn/cnn_engine.py.
+Every project directory is self-contained: its files are loaded with
+__import__ from their own directory, which is the only one on the path,
+so neither engine can import the other. A fix to one copy belongs in both
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Largest im2col matrix, in bytes, before falling back to direct
+IM2COL_MAX_BYTES = 2 ** 28
+
+# Largest FFT tile side used by overlap-add
+FFT_MAX_TILE = 256
+
+
+class Workspace:
+    """
+    Arena of preallocated buffers keyed by name, shape and dtype
+
+    Passing the same workspace to successive calls reuses its buffers
+    instead of allocating new ones. Arrays returned by a call that used a
+    workspace may be overwritten by the next call using it, so keep one
+    workspace per layer and copy results that must outlive the step.
+    """
+
+    def __init__(self):
+        """Initializes an empty workspace"""
+        self.buffers = {}
+
+    def empty(self, name, shape, dtype=float):
+        """
+        Returns the buffer for (name, shape, dtype), allocating it once
+
+        Args:
+            name: purpose of the buffer, so equal shapes do not collide
+            shape: shape of the buffer
+            dtype: dtype of the buffer
+
+        Returns:
+            numpy.ndarray with unspecified contents
+        """
+        key = (name, tuple(shape), np.dtype(dtype))
+        if key not in self.buffers:
+            self.buffers[key] = np.zeros(shape, dtype=dtype)
+        return self.buffers[key]
+
+    def zeros(self, name, shape, dtype=float):
+        """
+        Returns the buffer for (name, shape, dtype) filled with zeros
+
+        Args:
+            name: purpose of the buffer
+            shape: shape of the buffer
+            dtype: dtype of the buffer
+
+        Returns:
+            numpy.ndarray of zeros
+        """
+        buffer = self.empty(name, shape, dtype)
+        buffer.fill(0)
+        return buffer
+
+    def pad(self, name, A, padding):
+        """
+        Writes A into the interior of a zero-bordered buffer
+
+        The buffer is keyed by the padding as well as its shape, so every
+        call writing into it has the same interior; only the interior is
+        ever written, and the border allocated as zeros stays zero
+
+        Args:
+            name: purpose of the buffer
+            A: numpy.ndarray (m, h, w, c)
+            padding: (ph, pw) zero padding applied to each side
+
+        Returns:
+            numpy.ndarray (m, h + 2 * ph, w + 2 * pw, c)
+        """
+        m, h, w, c = A.shape
+        ph, pw = padding
+
+        # Same padded shape from another padding would leave stale data
+        # in the border
+        buffer = self.empty((name, ph, pw), (m, h + 2 * ph, w + 2 * pw, c),
+                            A.dtype)
+        buffer[:, ph:ph + h, pw:pw + w] = A
+        return buffer
+
+
+def pad_images(images, padding, workspace=None):
+    """
+    Zero pads the spatial dimensions of images
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        padding: (ph, pw) zero padding applied to each side
+        workspace: optional Workspace providing the padded buffer
+
+    Returns:
+        numpy.ndarray (m, h + 2 * ph, w + 2 * pw, c)
+    """
+    ph, pw = padding
+
+    if not (ph or pw):
+        return images
+
+    if workspace is not None:
+        return workspace.pad('padded', images, padding)
+
+    return np.pad(
+        images,
+        ((0, 0), (ph, ph), (pw, pw), (0, 0)),
+        mode='constant'
+    )
+
+
+def resolve_dtype(dtype, *arrays):
+    """
+    Storage and accumulation dtypes of a computation
+
+    Args:
+        dtype: requested storage dtype, or None to keep the floating dtype
+               of the inputs (float64 for integer inputs)
+        arrays: inputs of the computation
+
+    Returns:
+        dtype: dtype of the results
+        acc: dtype the computation runs in; at least float32, so that
+             float16 storage accumulates in float32
+    """
+    if dtype is None:
+        dtype = np.result_type(*arrays)
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+
+    dtype = np.dtype(dtype)
+
+    return dtype, np.promote_types(dtype, np.float32)
+
+
+def im2col(images, kernel_shape, padding=(0, 0), stride=(1, 1),
+           workspace=None):
+    """
+    Builds a strided view of every convolution window of images
+
+    No data is copied: the windows are a view on the (padded) images
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        kernel_shape: (kh, kw)
+        padding: (ph, pw) zero padding applied to each side
+        stride: (sh, sw)
+
+    Returns:
+        numpy.ndarray (m, output_h, output_w, c, kh, kw) of windows
+    """
+    sh, sw = stride
+
+    images = pad_images(images, padding, workspace)
+    windows = sliding_window_view(images, kernel_shape, axis=(1, 2))
+
+    return windows[:, ::sh, ::sw]
+
+
+def convolve_im2col(images, kernels, padding=(0, 0), stride=(1, 1),
+                    workspace=None):
+    """
+    Performs a convolution as a single GEMM over all windows
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        kernels: numpy.ndarray (kh, kw, c, nc)
+        padding: (ph, pw) zero padding applied to each side
+        stride: (sh, sw)
+        workspace: optional Workspace providing the padded buffer
+
+    Returns:
+        numpy.ndarray (m, output_h, output_w, nc)
+    """
+    kh, kw, _, _ = kernels.shape
+
+    windows = im2col(images, (kh, kw), padding, stride, workspace)
+
+    # (m, oh, ow, c, kh, kw) x (kh, kw, c, nc) -> (m, oh, ow, nc)
+    return np.tensordot(windows, kernels, axes=([3, 4, 5], [2, 0, 1]))
+
+
+def convolve_direct(images, kernels, padding=(0, 0), stride=(1, 1),
+                    workspace=None):
+    """
+    Performs a convolution with one GEMM over the channels per kernel
+    offset, without building the im2col matrix
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        kernels: numpy.ndarray (kh, kw, c, nc)
+        padding: (ph, pw) zero padding applied to each side
+        stride: (sh, sw)
+        workspace: optional Workspace providing the padded buffer
+
+    Returns:
+        numpy.ndarray (m, output_h, output_w, nc)
+    """
+    kh, kw, _, nc = kernels.shape
+    sh, sw = stride
+
+    padded = pad_images(images, padding, workspace)
+    m, hp, wp, _ = padded.shape
+
+    output_h = (hp - kh) // sh + 1
+    output_w = (wp - kw) // sw + 1
+
+    output = np.zeros((m, output_h, output_w, nc),
+                      dtype=np.result_type(padded, kernels))
+
+    for i in range(kh):
+        for j in range(kw):
+            region = padded[:, i:i + sh * output_h:sh,
+                            j:j + sw * output_w:sw, :]
+            output += region @ kernels[i, j]
+
+    return output
+
+
+def fft_tiling(n, k):
+    """
+    Chooses the overlap-add tiling of one spatial dimension
+
+    Args:
+        n: padded image size
+        k: kernel size
+
+    Returns:
+        size: FFT length, a power of two
+        block: number of image rows/columns handled by each tile
+    """
+    full = n + k - 1
+    size = 2 ** int(np.ceil(np.log2(min(full, max(FFT_MAX_TILE, 2 * k)))))
+
+    return size, min(n, size - k + 1)
+
+
+def convolve_fft(images, kernels, padding=(0, 0), stride=(1, 1),
+                 workspace=None):
+    """
+    Performs a convolution in the frequency domain
+
+    The padded images are cut into tiles whose rfft2 is multiplied by
+    that of the flipped kernels and mixed over the channels; the full
+    convolutions of the tiles are summed by overlap-add and the valid,
+    strided part is kept
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        kernels: numpy.ndarray (kh, kw, c, nc)
+        padding: (ph, pw) zero padding applied to each side
+        stride: (sh, sw)
+        workspace: optional Workspace providing the padded buffer
+
+    Returns:
+        numpy.ndarray (m, output_h, output_w, nc)
+    """
+    kh, kw, _, nc = kernels.shape
+    sh, sw = stride
+
+    padded = pad_images(images, padding, workspace)
+    m, hp, wp, _ = padded.shape
+
+    fh, bh = fft_tiling(hp, kh)
+    fw, bw = fft_tiling(wp, kw)
+
+    # Correlation is a convolution with the flipped kernels
+    kernels_f = np.fft.rfft2(kernels[::-1, ::-1], s=(fh, fw), axes=(0, 1))
+
+    full = np.zeros((m, hp + fh, wp + fw, nc),
+                    dtype=np.result_type(padded, kernels))
+
+    # Overlap-add: each tile's full convolution spills kh - 1 rows and
+    # kw - 1 columns into its neighbours
+    for r in range(0, hp, bh):
+        for q in range(0, wp, bw):
+            tile = padded[:, r:r + bh, q:q + bw, :]
+            tile_f = np.fft.rfft2(tile, s=(fh, fw), axes=(1, 2))
+            prod = np.einsum('myxc,yxcn->myxn', tile_f, kernels_f,
+                             optimize=True)
+            full[:, r:r + fh, q:q + fw] += np.fft.irfft2(
+                prod, s=(fh, fw), axes=(1, 2)
+            )
+
+    output_h = (hp - kh) // sh + 1
+    output_w = (wp - kw) // sw + 1
+
+    return full[:, kh - 1:kh - 1 + sh * output_h:sh,
+                kw - 1:kw - 1 + sw * output_w:sw]
+
+
+def choose_method(images_shape, kernels_shape, padding=(0, 0),
+                  stride=(1, 1)):
+    """
+    Picks the cheapest convolution backend from a cost model
+
+    The costs are in nanoseconds, with constants fitted to the measured
+    runtimes of the three backends in float64:
+        direct: a GEMM of all windows per kernel offset, plus reading
+                the region and accumulating the output at every offset
+        im2col: one GEMM, plus copying the window matrix
+        fft: per tile, rfft2 of the images and irfft2 of the outputs,
+             and the complex channel mix over half the spectrum; plus
+             the kernel transforms
+    FFT only wins when kh * kw is large compared with the per-tile
+    transforms and mixing, e.g. 15x15 kernels on few channels; 3x3 and
+    5x5 layers over many channels go to the spatial backends. im2col is
+    ruled out when its window matrix would exceed IM2COL_MAX_BYTES
+
+    Args:
+        images_shape: (m, h, w, c)
+        kernels_shape: (kh, kw, c, nc)
+        padding: (ph, pw)
+        stride: (sh, sw)
+
+    Returns:
+        'direct', 'im2col' or 'fft'
+    """
+    m, h, w, c = images_shape
+    kh, kw, _, nc = kernels_shape
+    ph, pw = padding
+    sh, sw = stride
+
+    hp, wp = h + 2 * ph, w + 2 * pw
+    output_h = (hp - kh) // sh + 1
+    output_w = (wp - kw) // sw + 1
+
+    outputs = m * output_h * output_w
+    windows = outputs * kh * kw
+
+    costs = {
+        'direct': (0.036 * windows * c * nc
+                   + 0.47 * windows * (c + nc)
+                   + 14000 * kh * kw),
+        'im2col': 0.047 * windows * c * nc + 2.3 * windows * c
+    }
+
+    fh, bh = fft_tiling(hp, kh)
+    fw, bw = fft_tiling(wp, kw)
+    tiles = int(np.ceil(hp / bh)) * int(np.ceil(wp / bw))
+    points = fh * fw
+    costs['fft'] = (tiles * m * points * (9.4 * (c + nc)
+                                          + 0.27 * c * nc)
+                    + 0.79 * c * nc * points * np.log2(points))
+
+    if windows * c * 8 > IM2COL_MAX_BYTES:
+        del costs['im2col']
+
+    return min(costs, key=costs.get)
+
+
+def conv2d(images, kernels, padding=(0, 0), stride=(1, 1), method='auto',
+           workspace=None, dtype=None):
+    """
+    Performs a convolution with the requested or cheapest backend
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        kernels: numpy.ndarray (kh, kw, c, nc)
+        padding: (ph, pw) zero padding applied to each side
+        stride: (sh, sw)
+        method: 'auto', 'direct', 'im2col' or 'fft'
+        workspace: optional Workspace providing the padded buffer
+        dtype: dtype of the result, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
+
+    Returns:
+        numpy.ndarray (m, output_h, output_w, nc)
+    """
+    dtype, acc = resolve_dtype(dtype, images, kernels)
+
+    if method == 'auto':
+        method = choose_method(images.shape, kernels.shape, padding, stride)
+
+    backends = {
+        'direct': convolve_direct,
+        'im2col': convolve_im2col,
+        'fft': convolve_fft
+    }
+    if method not in backends:
+        raise ValueError("method must be 'auto', 'direct', 'im2col' or 'fft'")
+
+    output = backends[method](images.astype(acc, copy=False),
+                              kernels.astype(acc, copy=False),
+                              padding, stride, workspace)
+
+    return output.astype(dtype, copy=False)
+
+
+def pool_windows(images, kernel_shape, stride):
+    """
+    Builds a strided view of every pooling window of images
+
+    Non-overlapping windows (stride equal to the kernel) are obtained by
+    reshaping the images directly, overlapping ones with
+    sliding_window_view; no data is copied either way
+
+    Args:
+        images: numpy.ndarray (m, h, w, c)
+        kernel_shape: (kh, kw)
+        stride: (sh, sw)
+
+    Returns:
+        numpy.ndarray (m, output_h, output_w, c, kh, kw) of windows
+    """
+    m, h, w, c = images.shape
+    kh, kw = kernel_shape
+    sh, sw = stride
+
+    if (sh, sw) == (kh, kw):
+        output_h = h // kh
+        output_w = w // kw
+        blocks = images[:, :output_h * kh, :output_w * kw].reshape(
+            m, output_h, kh, output_w, kw, c
+        )
+        return blocks.transpose(0, 1, 3, 5, 2, 4)
+
+    windows = sliding_window_view(images, (kh, kw), axis=(1, 2))
+
+    return windows[:, ::sh, ::sw]
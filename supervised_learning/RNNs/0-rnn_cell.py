@@ -29,6 +29,105 @@ class RNNCell:
         self.bh = np.zeros((1, h))
         self.by = np.zeros((1, o))
 
+    def project(self, X):
+        """
+        Computes the input part of the hidden state for all time steps.
+
+        Parameters:
+            X (np.ndarray): Shape (t, m, i) containing the data input.
+
+        Returns:
+            np.ndarray of shape (t, m, h) to be passed to step
+        """
+        h = self.Wh.shape[1]
+
+        # Rows of Wh after the first h act on x_t
+        return np.matmul(X, self.Wh[h:]) + self.bh
+
+    def step(self, h_prev, xw_t):
+        """
+        Computes the next hidden state without the output.
+
+        Parameters:
+            h_prev (np.ndarray): Shape (m, h) containing previous hidden state.
+            xw_t (np.ndarray): Shape (m, h), project(X)[t].
+
+        Returns:
+            h_next (np.ndarray): The next hidden state.
+        """
+        h = self.Wh.shape[1]
+
+        # Rows of Wh up to h act on h_prev
+        return np.tanh(xw_t + np.matmul(h_prev, self.Wh[:h]))
+
+    def parameters(self):
+        """
+        Returns the trainable parameters by name.
+
+        Returns:
+            dict of the arrays updated in place during training
+        """
+        return {'Wh': self.Wh, 'bh': self.bh, 'Wy': self.Wy, 'by': self.by}
+
+    def step_backward(self, grads, h_prev, xw_t, dh_next):
+        """
+        Back propagation through step, recomputing its activations.
+
+        Parameters:
+            grads (dict): Gradients by parameter name, accumulated in place.
+            h_prev (np.ndarray): Shape (m, h), the h_prev given to step.
+            xw_t (np.ndarray): Shape (m, h), the xw_t given to step.
+            dh_next (np.ndarray): Shape (m, h), gradient of the next hidden
+                                  state.
+
+        Returns:
+            dh_prev (np.ndarray): Gradient of h_prev, shape (m, h).
+            dxw_t (np.ndarray): Gradient of xw_t, shape (m, h).
+        """
+        h = self.Wh.shape[1]
+        h_next = self.step(h_prev, xw_t)
+
+        # Through tanh
+        dxw_t = dh_next * (1 - h_next ** 2)
+
+        grads['Wh'][:h] += np.matmul(h_prev.T, dxw_t)
+
+        return np.matmul(dxw_t, self.Wh[:h].T), dxw_t
+
+    def project_backward(self, grads, X, dxw):
+        """
+        Back propagation through project.
+
+        Parameters:
+            grads (dict): Gradients by parameter name, accumulated in place.
+            X (np.ndarray): Shape (t, m, i), the X given to project.
+            dxw (np.ndarray): Shape (t, m, h), gradient of project(X).
+
+        Returns:
+            dX (np.ndarray): Gradient of X, shape (t, m, i).
+        """
+        h = self.Wh.shape[1]
+
+        grads['Wh'][h:] += np.tensordot(X, dxw, axes=([0, 1], [0, 1]))
+        grads['bh'] += np.sum(dxw, axis=(0, 1))
+
+        return np.matmul(dxw, self.Wh[h:].T)
+
+    def output(self, H):
+        """
+        Computes the softmax output for any number of hidden states.
+
+        Parameters:
+            H (np.ndarray): Shape (..., h) containing hidden states.
+
+        Returns:
+            np.ndarray of shape (..., o)
+        """
+        y_linear = np.matmul(H, self.Wy) + self.by
+        exp_y = np.exp(y_linear - np.max(y_linear, axis=-1, keepdims=True))
+
+        return exp_y / np.sum(exp_y, axis=-1, keepdims=True)
+
     def forward(self, h_prev, x_t):
         """
         Performs forward propagation for one time step.
@@ -42,17 +141,10 @@ class RNNCell:
             h_next (np.ndarray): The next hidden state.
             y (np.ndarray): The output of the cell.
         """
-        # Concatenate previous hidden state and input data horizontally
-        concat_input = np.concatenate((h_prev, x_t), axis=1)
-
         # Calculate next hidden state using hyperbolic tangent (tanh)
-        h_next = np.tanh(np.matmul(concat_input, self.Wh) + self.bh)
-
-        # Calculate raw linear outputs
-        y_linear = np.matmul(h_next, self.Wy) + self.by
+        h_next = self.step(h_prev, self.project(x_t))
 
         # Calculate output activation using Softmax
-        exp_y = np.exp(y_linear - np.max(y_linear, axis=1, keepdims=True))
-        y = exp_y / np.sum(exp_y, axis=1, keepdims=True)
+        y = self.output(h_next)
 
         return h_next, y
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Module containing the BidirectionalCell class and the bi_rnn function for
+forward propagation through a bidirectional RNN.
+"""
+
+import numpy as np
+
+
+class BidirectionalCell:
+    """
+    Represents a bidirectional cell of an RNN.
+    """
+
+    def __init__(self, i, h, o):
+        """
+        Class constructor for BidirectionalCell.
+
+        Parameters:
+            i (int): Dimensionality of the data input
+            h (int): Dimensionality of the hidden states
+            o (int): Dimensionality of the outputs
+        """
+        # Forward and backward direction weights, on concat(h, x_t)
+        self.Whf = np.random.normal(size=(h + i, h))
+        self.Whb = np.random.normal(size=(h + i, h))
+        # Output weights, on concat(h_forward, h_backward)
+        self.Wy = np.random.normal(size=(2 * h, o))
+
+        self.bhf = np.zeros((1, h))
+        self.bhb = np.zeros((1, h))
+        self.by = np.zeros((1, o))
+
+    def forward(self, h_prev, x_t):
+        """
+        Calculates the hidden state in the forward direction for one step.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            x_t (numpy.ndarray): Shape (m, i) containing data input for cell
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+        """
+        concat_input = np.concatenate((h_prev, x_t), axis=1)
+
+        return np.tanh(np.matmul(concat_input, self.Whf) + self.bhf)
+
+    def backward(self, h_next, x_t):
+        """
+        Calculates the hidden state in the backward direction for one step.
+
+        Parameters:
+            h_next (numpy.ndarray): Shape (m, h) containing next hidden
+                                   state
+            x_t (numpy.ndarray): Shape (m, i) containing data input for cell
+
+        Returns:
+            h_prev (numpy.ndarray): Previous hidden state of shape (m, h)
+        """
+        concat_input = np.concatenate((h_next, x_t), axis=1)
+
+        return np.tanh(np.matmul(concat_input, self.Whb) + self.bhb)
+
+    def output(self, H):
+        """
+        Calculates all outputs of the RNN.
+
+        Parameters:
+            H (numpy.ndarray): Shape (t, m, 2h) containing the concatenated
+                               hidden states of both directions
+
+        Returns:
+            Y (numpy.ndarray): Outputs of shape (t, m, o)
+        """
+        y_linear = np.matmul(H, self.Wy) + self.by
+        exp_y = np.exp(y_linear - np.max(y_linear, axis=-1, keepdims=True))
+
+        return exp_y / np.sum(exp_y, axis=-1, keepdims=True)
+
+    def run_direction(self, X, h_0, H, reverse=False):
+        """
+        Runs one direction over a whole sequence, writing into H.
+
+        The input half of the weights is applied to every time step in one
+        GEMM, and each hidden state is written straight into its slot of H.
+
+        Parameters:
+            X (numpy.ndarray): Shape (t, m, i) containing the data input
+            h_0 (numpy.ndarray): Shape (m, h), initial state of the
+                                direction
+            H (numpy.ndarray): Shape (t, m, h) view receiving the hidden
+                              states
+            reverse (bool): Whether to run the backward direction
+        """
+        h = h_0.shape[1]
+        W, b = (self.Whb, self.bhb) if reverse else (self.Whf, self.bhf)
+
+        xw = np.matmul(X, W[h:]) + b
+        steps = range(X.shape[0] - 1, -1, -1) if reverse else range(
+            X.shape[0])
+
+        h_prev = h_0
+        for step in steps:
+            np.tanh(xw[step] + np.matmul(h_prev, W[:h]), out=H[step])
+            h_prev = H[step]
+
+
+def bi_rnn(bi_cell, X, h_0, h_t):
+    """
+    Performs forward propagation for a bidirectional RNN.
+
+    Each direction runs over the whole sequence in turn, writing its
+    hidden states straight into its half of H.
+
+    Parameters:
+        bi_cell (BidirectionalCell): Cell used for forward propagation
+        X (numpy.ndarray): Input data of shape (t, m, i)
+            t: maximum number of time steps
+            m: batch size
+            i: dimensionality of the data
+        h_0 (numpy.ndarray): Initial hidden state in the forward direction
+            of shape (m, h)
+        h_t (numpy.ndarray): Initial hidden state in the backward direction
+            of shape (m, h)
+
+    Returns:
+        H (numpy.ndarray): Shape (t, m, 2h) containing the concatenated
+            hidden states of both directions
+        Y (numpy.ndarray): Shape (t, m, o) containing all outputs
+    """
+    t, m, _ = X.shape
+    h = h_0.shape[1]
+
+    # Both directions write into their half of one preallocated buffer
+    H = np.empty((t, m, 2 * h))
+
+    bi_cell.run_direction(X, h_0, H[:, :, :h])
+    bi_cell.run_direction(X, h_t, H[:, :, h:], True)
+
+    return H, bi_cell.output(H)
@@ -6,6 +6,11 @@ Module containing the GRUCell class representing a gated recurrent unit.
 import numpy as np
 
 
+def sigmoid(z):
+    """Sigmoid activation"""
+    return 1 / (1 + np.exp(-z))
+
+
 class GRUCell:
     """
     Represents a gated recurrent unit (GRU) cell.
@@ -36,9 +41,25 @@ class GRUCell:
         self.Wy = np.random.normal(size=(h, o))
         self.by = np.zeros((1, o))
 
-    def forward(self, h_prev, x_t):
+    def project(self, X):
         """
-        Performs forward propagation for one time step.
+        Returns the per-step input of step, here the data input itself.
+
+        The gates use the concatenation of h_prev and x_t, so nothing can
+        be computed ahead of the recurrence; FusedGRUCell precomputes the
+        input part of the gates instead.
+
+        Parameters:
+            X (numpy.ndarray): Shape (t, m, i) containing the data input
+
+        Returns:
+            X
+        """
+        return X
+
+    def step(self, h_prev, x_t):
+        """
+        Computes the next hidden state without the output.
 
         Parameters:
             h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
@@ -47,15 +68,10 @@ class GRUCell:
 
         Returns:
             h_next (numpy.ndarray): Next hidden state of shape (m, h)
-            y (numpy.ndarray): Output of the cell of shape (m, o)
         """
         # Concatenate previous hidden state and input: h_prev first, x_t second
         concat_input = np.concatenate((h_prev, x_t), axis=1)
 
-        # Helper function for sigmoid activation
-        def sigmoid(z):
-            return 1 / (1 + np.exp(-z))
-
         # Update Gate
         z_t = sigmoid(np.matmul(concat_input, self.Wz) + self.bz)
 
@@ -69,11 +85,37 @@ class GRUCell:
         h_tilde = np.tanh(np.matmul(concat_candidate, self.Wh) + self.bh)
 
         # Next Hidden State
-        h_next = (1 - z_t) * h_prev + z_t * h_tilde
+        return (1 - z_t) * h_prev + z_t * h_tilde
 
-        # Softmax Output Projection
-        y_linear = np.matmul(h_next, self.Wy) + self.by
-        exp_y = np.exp(y_linear - np.max(y_linear, axis=1, keepdims=True))
-        y = exp_y / np.sum(exp_y, axis=1, keepdims=True)
+    def output(self, H):
+        """
+        Computes the softmax output for any number of hidden states.
+
+        Parameters:
+            H (numpy.ndarray): Shape (..., h) containing hidden states
 
-        return h_next, y
+        Returns:
+            numpy.ndarray of shape (..., o)
+        """
+        y_linear = np.matmul(H, self.Wy) + self.by
+        exp_y = np.exp(y_linear - np.max(y_linear, axis=-1, keepdims=True))
+
+        return exp_y / np.sum(exp_y, axis=-1, keepdims=True)
+
+    def forward(self, h_prev, x_t):
+        """
+        Performs forward propagation for one time step.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            x_t (numpy.ndarray): Shape (m, i) containing data input for cell
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+            y (numpy.ndarray): Output of the cell of shape (m, o)
+        """
+        h_next = self.step(h_prev, x_t)
+
+        # Softmax Output Projection
+        return h_next, self.output(h_next)
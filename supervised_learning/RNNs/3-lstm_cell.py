@@ -6,11 +6,19 @@ Module containing the LSTMCell class that represents an LSTM unit.
 import numpy as np
 
 
+def sigmoid(z):
+    """Sigmoid activation"""
+    return 1 / (1 + np.exp(-z))
+
+
 class LSTMCell:
     """
     Represents a Long Short-Term Memory (LSTM) cell.
     """
 
+    # step carries a cell state besides the hidden state
+    cell_state = True
+
     def __init__(self, i, h, o):
         """
         Class constructor for LSTMCell.
@@ -40,9 +48,25 @@ class LSTMCell:
         self.Wy = np.random.normal(size=(h, o))
         self.by = np.zeros((1, o))
 
-    def forward(self, h_prev, c_prev, x_t):
+    def project(self, X):
         """
-        Performs forward propagation for one time step.
+        Returns the per-step input of step, here the data input itself.
+
+        The gates use the concatenation of h_prev and x_t, so nothing can
+        be computed ahead of the recurrence; FusedLSTMCell precomputes the
+        input part of the gates instead.
+
+        Parameters:
+            X (numpy.ndarray): Shape (t, m, i) containing the data input
+
+        Returns:
+            X
+        """
+        return X
+
+    def step(self, h_prev, c_prev, x_t):
+        """
+        Computes the next hidden and cell states without the output.
 
         Parameters:
             h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
@@ -54,15 +78,10 @@ class LSTMCell:
         Returns:
             h_next (numpy.ndarray): Next hidden state of shape (m, h)
             c_next (numpy.ndarray): Next cell state of shape (m, h)
-            y (numpy.ndarray): Output of the cell of shape (m, o)
         """
         # Concatenate hidden state and input: h_prev before x_t
         concat_input = np.concatenate((h_prev, x_t), axis=1)
 
-        # Sigmoid activation helper
-        def sigmoid(z):
-            return 1 / (1 + np.exp(-z))
-
         # Forget Gate
         f_t = sigmoid(np.matmul(concat_input, self.Wf) + self.bf)
 
@@ -81,9 +100,40 @@ class LSTMCell:
         # Next Hidden State
         h_next = o_t * np.tanh(c_next)
 
-        # Output (Softmax)
-        y_linear = np.matmul(h_next, self.Wy) + self.by
-        exp_y = np.exp(y_linear - np.max(y_linear, axis=1, keepdims=True))
-        y = exp_y / np.sum(exp_y, axis=1, keepdims=True)
+        return h_next, c_next
+
+    def output(self, H):
+        """
+        Computes the softmax output for any number of hidden states.
+
+        Parameters:
+            H (numpy.ndarray): Shape (..., h) containing hidden states
+
+        Returns:
+            numpy.ndarray of shape (..., o)
+        """
+        y_linear = np.matmul(H, self.Wy) + self.by
+        exp_y = np.exp(y_linear - np.max(y_linear, axis=-1, keepdims=True))
+
+        return exp_y / np.sum(exp_y, axis=-1, keepdims=True)
 
-        return h_next, c_next, y
+    def forward(self, h_prev, c_prev, x_t):
+        """
+        Performs forward propagation for one time step.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            c_prev (numpy.ndarray): Shape (m, h) containing previous cell
+                                   state
+            x_t (numpy.ndarray): Shape (m, i) containing data input for cell
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+            c_next (numpy.ndarray): Next cell state of shape (m, h)
+            y (numpy.ndarray): Output of the cell of shape (m, o)
+        """
+        h_next, c_next = self.step(h_prev, c_prev, x_t)
+
+        # Output (Softmax)
+        return h_next, c_next, self.output(h_next)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Module containing the FusedLSTMCell class, an LSTM unit whose four gates
+share one stacked weight matrix.
+"""
+
+import numpy as np
+
+
+def sigmoid(z):
+    """Sigmoid activation"""
+    return 1 / (1 + np.exp(-z))
+
+
+class FusedLSTMCell:
+    """
+    Represents a Long Short-Term Memory (LSTM) cell with fused gates.
+
+    The gate weights are stacked into one (h + i, 4h) matrix W whose column
+    blocks are the forget, update and output gates and the candidate cell
+    state. Its first h rows act on the hidden state (W_h) and the last i
+    rows on the input (W_x), so the input projection of a whole sequence
+    is a single GEMM and each time step only multiplies by W_h.
+    """
+
+    # step carries a cell state besides the hidden state
+    cell_state = True
+
+    def __init__(self, i, h, o):
+        """
+        Class constructor for FusedLSTMCell.
+
+        Parameters:
+            i (int): Dimensionality of the data input
+            h (int): Dimensionality of the hidden state
+            o (int): Dimensionality of the outputs
+        """
+        # Stacked gate weights & biases: forget, update, output, candidate
+        self.W = np.random.normal(size=(h + i, 4 * h))
+        self.b = np.zeros((1, 4 * h))
+
+        # Recurrent and input parts, views into W
+        self.W_h = self.W[:h]
+        self.W_x = self.W[h:]
+
+        # Output Weights & Biases
+        self.Wy = np.random.normal(size=(h, o))
+        self.by = np.zeros((1, o))
+
+    @classmethod
+    def from_cell(cls, cell):
+        """
+        Builds a fused cell with the weights of an LSTMCell.
+
+        Parameters:
+            cell (LSTMCell): cell with Wf, Wu, Wc, Wo, Wy and their biases
+
+        Returns:
+            FusedLSTMCell computing the same function as cell
+        """
+        h_i, h = cell.Wf.shape
+        fused = cls(h_i - h, h, cell.Wy.shape[1])
+
+        fused.W[...] = np.hstack((cell.Wf, cell.Wu, cell.Wo, cell.Wc))
+        fused.b[...] = np.hstack((cell.bf, cell.bu, cell.bo, cell.bc))
+        fused.Wy[...] = cell.Wy
+        fused.by[...] = cell.by
+
+        return fused
+
+    def project(self, X):
+        """
+        Computes the input part of the gates for every time step at once.
+
+        Parameters:
+            X (numpy.ndarray): Shape (t, m, i) containing the data input
+
+        Returns:
+            numpy.ndarray of shape (t, m, 4h), X @ W_x + b
+        """
+        return np.matmul(X, self.W_x) + self.b
+
+    def step(self, h_prev, c_prev, xw_t):
+        """
+        Performs one time step given the projected input.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            c_prev (numpy.ndarray): Shape (m, h) containing previous cell
+                                   state
+            xw_t (numpy.ndarray): Shape (m, 4h), project(X)[t]
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+            c_next (numpy.ndarray): Next cell state of shape (m, h)
+        """
+        h = h_prev.shape[1]
+
+        # All four gates from one recurrent GEMM
+        gates = xw_t + np.matmul(h_prev, self.W_h)
+
+        # Forget, update and output gates are contiguous: one sigmoid
+        sig = sigmoid(gates[:, :3 * h])
+        f_t = sig[:, :h]
+        u_t = sig[:, h:2 * h]
+        o_t = sig[:, 2 * h:]
+
+        # Candidate Cell State
+        c_tilde = np.tanh(gates[:, 3 * h:])
+
+        c_next = f_t * c_prev + u_t * c_tilde
+        h_next = o_t * np.tanh(c_next)
+
+        return h_next, c_next
+
+    def parameters(self):
+        """
+        Returns the trainable parameters by name.
+
+        Returns:
+            dict of the arrays updated in place during training
+        """
+        return {'W': self.W, 'b': self.b, 'Wy': self.Wy, 'by': self.by}
+
+    def step_backward(self, grads, h_prev, c_prev, xw_t, dh_next, dc_next):
+        """
+        Back propagation through step, recomputing its activations.
+
+        Parameters:
+            grads (dict): Gradients by parameter name, accumulated in place
+            h_prev (numpy.ndarray): Shape (m, h), the h_prev given to step
+            c_prev (numpy.ndarray): Shape (m, h), the c_prev given to step
+            xw_t (numpy.ndarray): Shape (m, 4h), the xw_t given to step
+            dh_next (numpy.ndarray): Shape (m, h), gradient of the next
+                                    hidden state
+            dc_next (numpy.ndarray): Shape (m, h), gradient of the next
+                                    cell state
+
+        Returns:
+            dh_prev (numpy.ndarray): Gradient of h_prev, shape (m, h)
+            dc_prev (numpy.ndarray): Gradient of c_prev, shape (m, h)
+            dxw_t (numpy.ndarray): Gradient of xw_t, shape (m, 4h)
+        """
+        h = h_prev.shape[1]
+
+        # Recompute the gates rather than storing them
+        gates = xw_t + np.matmul(h_prev, self.W_h)
+        sig = sigmoid(gates[:, :3 * h])
+        f_t = sig[:, :h]
+        u_t = sig[:, h:2 * h]
+        o_t = sig[:, 2 * h:]
+        c_tilde = np.tanh(gates[:, 3 * h:])
+        tanh_c = np.tanh(f_t * c_prev + u_t * c_tilde)
+
+        # Through h_next = o_t * tanh(c_next)
+        dc = dc_next + dh_next * o_t * (1 - tanh_c ** 2)
+
+        dgates = np.empty_like(gates)
+        dgates[:, :h] = dc * c_prev
+        dgates[:, h:2 * h] = dc * c_tilde
+        dgates[:, 2 * h:3 * h] = dh_next * tanh_c
+        dgates[:, :3 * h] *= sig * (1 - sig)
+        dgates[:, 3 * h:] = dc * u_t * (1 - c_tilde ** 2)
+
+        grads['W'][:h] += np.matmul(h_prev.T, dgates)
+
+        return np.matmul(dgates, self.W_h.T), dc * f_t, dgates
+
+    def project_backward(self, grads, X, dxw):
+        """
+        Back propagation through project.
+
+        Parameters:
+            grads (dict): Gradients by parameter name, accumulated in place
+            X (numpy.ndarray): Shape (t, m, i), the X given to project
+            dxw (numpy.ndarray): Shape (t, m, 4h), gradient of project(X)
+
+        Returns:
+            dX (numpy.ndarray): Gradient of X, shape (t, m, i)
+        """
+        h = self.W_h.shape[0]
+
+        grads['W'][h:] += np.tensordot(X, dxw, axes=([0, 1], [0, 1]))
+        grads['b'] += np.sum(dxw, axis=(0, 1))
+
+        return np.matmul(dxw, self.W_x.T)
+
+    def output(self, H):
+        """
+        Computes the softmax output for any number of hidden states.
+
+        Parameters:
+            H (numpy.ndarray): Shape (..., h) containing hidden states
+
+        Returns:
+            numpy.ndarray of shape (..., o)
+        """
+        y_linear = np.matmul(H, self.Wy) + self.by
+        exp_y = np.exp(y_linear - np.max(y_linear, axis=-1, keepdims=True))
+
+        return exp_y / np.sum(exp_y, axis=-1, keepdims=True)
+
+    def forward(self, h_prev, c_prev, x_t):
+        """
+        Performs forward propagation for one time step.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            c_prev (numpy.ndarray): Shape (m, h) containing previous cell
+                                   state
+            x_t (numpy.ndarray): Shape (m, i) containing data input for cell
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+            c_next (numpy.ndarray): Next cell state of shape (m, h)
+            y (numpy.ndarray): Output of the cell of shape (m, o)
+        """
+        h_next, c_next = self.step(h_prev, c_prev, self.project(x_t))
+
+        return h_next, c_next, self.output(h_next)
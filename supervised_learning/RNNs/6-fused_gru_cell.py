@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Module containing the FusedGRUCell class, a gated recurrent unit whose
+gates share one stacked weight matrix.
+"""
+
+import numpy as np
+
+
+def sigmoid(z):
+    """Sigmoid activation"""
+    return 1 / (1 + np.exp(-z))
+
+
+class FusedGRUCell:
+    """
+    Represents a gated recurrent unit (GRU) cell with fused gates.
+
+    The weights are stacked into one (h + i, 3h) matrix W whose column
+    blocks are the update gate, the reset gate and the candidate hidden
+    state. Its first h rows act on the hidden state (W_h) and the last i
+    rows on the input (W_x), so the input projection of a whole sequence
+    is a single GEMM. Each time step multiplies h_prev by the gate columns
+    of W_h, then r_t * h_prev by its candidate columns.
+    """
+
+    def __init__(self, i, h, o):
+        """
+        Class constructor for FusedGRUCell.
+
+        Parameters:
+            i (int): Dimensionality of the data input
+            h (int): Dimensionality of the hidden state
+            o (int): Dimensionality of the outputs
+        """
+        # Stacked weights & biases: update, reset, candidate
+        self.W = np.random.normal(size=(h + i, 3 * h))
+        self.b = np.zeros((1, 3 * h))
+
+        # Recurrent and input parts, views into W
+        self.W_h = self.W[:h]
+        self.W_x = self.W[h:]
+
+        # Output Weights & Biases
+        self.Wy = np.random.normal(size=(h, o))
+        self.by = np.zeros((1, o))
+
+    @classmethod
+    def from_cell(cls, cell):
+        """
+        Builds a fused cell with the weights of a GRUCell.
+
+        Parameters:
+            cell (GRUCell): cell with Wz, Wr, Wh, Wy and their biases
+
+        Returns:
+            FusedGRUCell computing the same function as cell
+        """
+        h_i, h = cell.Wz.shape
+        fused = cls(h_i - h, h, cell.Wy.shape[1])
+
+        fused.W[...] = np.hstack((cell.Wz, cell.Wr, cell.Wh))
+        fused.b[...] = np.hstack((cell.bz, cell.br, cell.bh))
+        fused.Wy[...] = cell.Wy
+        fused.by[...] = cell.by
+
+        return fused
+
+    def project(self, X):
+        """
+        Computes the input part of the gates for every time step at once.
+
+        Parameters:
+            X (numpy.ndarray): Shape (t, m, i) containing the data input
+
+        Returns:
+            numpy.ndarray of shape (t, m, 3h), X @ W_x + b
+        """
+        return np.matmul(X, self.W_x) + self.b
+
+    def step(self, h_prev, xw_t):
+        """
+        Performs one time step given the projected input.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            xw_t (numpy.ndarray): Shape (m, 3h), project(X)[t]
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+        """
+        h = h_prev.shape[1]
+
+        # Update and reset gates from one recurrent GEMM
+        gates = sigmoid(xw_t[:, :2 * h]
+                        + np.matmul(h_prev, self.W_h[:, :2 * h]))
+        z_t = gates[:, :h]
+        r_t = gates[:, h:]
+
+        # Candidate Hidden State from the reset-gated hidden state
+        h_tilde = np.tanh(xw_t[:, 2 * h:]
+                          + np.matmul(r_t * h_prev, self.W_h[:, 2 * h:]))
+
+        return (1 - z_t) * h_prev + z_t * h_tilde
+
+    def parameters(self):
+        """
+        Returns the trainable parameters by name.
+
+        Returns:
+            dict of the arrays updated in place during training
+        """
+        return {'W': self.W, 'b': self.b, 'Wy': self.Wy, 'by': self.by}
+
+    def step_backward(self, grads, h_prev, xw_t, dh_next):
+        """
+        Back propagation through step, recomputing its activations.
+
+        Parameters:
+            grads (dict): Gradients by parameter name, accumulated in place
+            h_prev (numpy.ndarray): Shape (m, h), the h_prev given to step
+            xw_t (numpy.ndarray): Shape (m, 3h), the xw_t given to step
+            dh_next (numpy.ndarray): Shape (m, h), gradient of the next
+                                    hidden state
+
+        Returns:
+            dh_prev (numpy.ndarray): Gradient of h_prev, shape (m, h)
+            dxw_t (numpy.ndarray): Gradient of xw_t, shape (m, 3h)
+        """
+        h = h_prev.shape[1]
+
+        # Recompute the gates rather than storing them
+        gates = sigmoid(xw_t[:, :2 * h]
+                        + np.matmul(h_prev, self.W_h[:, :2 * h]))
+        z_t = gates[:, :h]
+        r_t = gates[:, h:]
+        rh = r_t * h_prev
+        h_tilde = np.tanh(xw_t[:, 2 * h:]
+                          + np.matmul(rh, self.W_h[:, 2 * h:]))
+
+        dxw_t = np.empty_like(xw_t)
+
+        # Through the candidate hidden state
+        dxw_t[:, 2 * h:] = dh_next * z_t * (1 - h_tilde ** 2)
+        grads['W'][:h, 2 * h:] += np.matmul(rh.T, dxw_t[:, 2 * h:])
+        drh = np.matmul(dxw_t[:, 2 * h:], self.W_h[:, 2 * h:].T)
+
+        # Through the update and reset gates
+        dxw_t[:, :h] = dh_next * (h_tilde - h_prev)
+        dxw_t[:, h:2 * h] = drh * h_prev
+        dxw_t[:, :2 * h] *= gates * (1 - gates)
+        grads['W'][:h, :2 * h] += np.matmul(h_prev.T, dxw_t[:, :2 * h])
+
+        dh_prev = (dh_next * (1 - z_t) + drh * r_t
+                   + np.matmul(dxw_t[:, :2 * h], self.W_h[:, :2 * h].T))
+
+        return dh_prev, dxw_t
+
+    def project_backward(self, grads, X, dxw):
+        """
+        Back propagation through project.
+
+        Parameters:
+            grads (dict): Gradients by parameter name, accumulated in place
+            X (numpy.ndarray): Shape (t, m, i), the X given to project
+            dxw (numpy.ndarray): Shape (t, m, 3h), gradient of project(X)
+
+        Returns:
+            dX (numpy.ndarray): Gradient of X, shape (t, m, i)
+        """
+        h = self.W_h.shape[0]
+
+        grads['W'][h:] += np.tensordot(X, dxw, axes=([0, 1], [0, 1]))
+        grads['b'] += np.sum(dxw, axis=(0, 1))
+
+        return np.matmul(dxw, self.W_x.T)
+
+    def output(self, H):
+        """
+        Computes the softmax output for any number of hidden states.
+
+        Parameters:
+            H (numpy.ndarray): Shape (..., h) containing hidden states
+
+        Returns:
+            numpy.ndarray of shape (..., o)
+        """
+        y_linear = np.matmul(H, self.Wy) + self.by
+        exp_y = np.exp(y_linear - np.max(y_linear, axis=-1, keepdims=True))
+
+        return exp_y / np.sum(exp_y, axis=-1, keepdims=True)
+
+    def forward(self, h_prev, x_t):
+        """
+        Performs forward propagation for one time step.
+
+        Parameters:
+            h_prev (numpy.ndarray): Shape (m, h) containing previous hidden
+                                   state
+            x_t (numpy.ndarray): Shape (m, i) containing data input for cell
+
+        Returns:
+            h_next (numpy.ndarray): Next hidden state of shape (m, h)
+            y (numpy.ndarray): Output of the cell of shape (m, o)
+        """
+        h_next = self.step(h_prev, self.project(x_t))
+
+        return h_next, self.output(h_next)
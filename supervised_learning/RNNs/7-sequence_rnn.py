@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Module containing the sequence_rnn function, a forward pass over a stack
+of RNN, GRU or LSTM cells that only computes the output of the top layer.
+"""
+
+import numpy as np
+
+
+def sequence_rnn(cells, X, h_0, c_0=None, return_cell_state=False,
+                 lengths=None):
+    """
+    Performs forward propagation for a deep RNN of any cell type.
+
+    Each cell must provide project(X), step(h_prev, [c_prev,] xw_t) and
+    output(H), as RNNCell, GRUCell, LSTMCell and the fused cells do; cells
+    with a truthy cell_state attribute (LSTMs) also carry a cell state.
+    Layers are run one after the other over the whole sequence, so each
+    layer projects all of its inputs at once, and the softmax output of
+    the top layer is computed in one batched GEMM after the recurrence.
+
+    With lengths, the batch is ordered by decreasing length so that the
+    sequences still running at each step are a prefix of it: each step
+    only computes that prefix, and the states of finished sequences stay
+    frozen at their last value.
+
+    Parameters:
+        cells (list): List of cells of length l, possibly of mixed types
+        X (numpy.ndarray): Input data of shape (t, m, i)
+            t: maximum number of time steps
+            m: batch size
+            i: dimensionality of the input data
+        h_0 (numpy.ndarray): Initial hidden state of shape (l, m, h)
+            l: number of layers
+            h: dimensionality of the hidden state
+        c_0 (numpy.ndarray): Initial cell state of shape (l, m, h), used
+            by LSTM layers; zeros if None
+        return_cell_state (bool): Whether to also return the cell states
+        lengths (numpy.ndarray): Shape (m,) containing the number of valid
+            time steps of each sequence; all t if None
+
+    Returns:
+        H (numpy.ndarray): Array containing all hidden states of shape
+            (t + 1, l, m, h)
+        C (numpy.ndarray): Only if return_cell_state, array containing all
+            cell states of shape (t + 1, l, m, h), zero for layers without
+            a cell state
+        Y (numpy.ndarray): Array containing the outputs of the top layer
+            of shape (t, m, o), zero past the end of each sequence
+    """
+    t, m, _ = X.shape
+    l, _, h = h_0.shape
+
+    if lengths is None:
+        order = None
+        active = np.full(t, m)
+    else:
+        # Longest sequences first, so the running ones are always a prefix
+        lengths = np.asarray(lengths)
+        order = np.argsort(-lengths, kind='stable')
+        X = X[:, order]
+        h_0 = h_0[:, order]
+        c_0 = None if c_0 is None else c_0[:, order]
+        active = np.sum(lengths[:, np.newaxis] > np.arange(t), axis=0)
+
+    # Containers for all hidden and cell states (includes t = 0 step)
+    H = np.zeros((t + 1, l, m, h))
+    H[0] = h_0
+    C = np.zeros((t + 1, l, m, h))
+    if c_0 is not None:
+        C[0] = c_0
+
+    layer_input = X
+
+    for layer, cell in enumerate(cells):
+        # Input part of every time step in one GEMM
+        xw = cell.project(layer_input)
+        lstm = getattr(cell, 'cell_state', False)
+
+        for step in range(t):
+            n = active[step]
+
+            if lstm:
+                H[step + 1, layer, :n], C[step + 1, layer, :n] = cell.step(
+                    H[step, layer, :n], C[step, layer, :n], xw[step, :n]
+                )
+            else:
+                H[step + 1, layer, :n] = cell.step(H[step, layer, :n],
+                                                   xw[step, :n])
+
+            # Finished sequences keep their last state
+            if n < m:
+                H[step + 1, layer, n:] = H[step, layer, n:]
+                C[step + 1, layer, n:] = C[step, layer, n:]
+
+        # Hidden states of this layer are the input of the next one
+        layer_input = H[1:, layer]
+
+    # Output of the top layer only, for all time steps at once
+    Y = cells[-1].output(H[1:, l - 1])
+
+    if order is not None:
+        # Zero the outputs past each end and restore the batch order
+        Y[np.arange(m) >= active[:, np.newaxis]] = 0
+        inverse = np.argsort(order)
+        H = H[:, :, inverse]
+        C = C[:, :, inverse]
+        Y = Y[:, inverse]
+
+    if return_cell_state:
+        return H, C, Y
+
+    return H, Y
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Module containing the bucket_batches function, which groups variable
+length sequences into padded batches of similar lengths.
+"""
+
+import numpy as np
+
+
+def bucket_batches(sequences, batch_size, shuffle=False, seed=None):
+    """
+    Yields padded batches of sequences of similar lengths.
+
+    Sequences are sorted by length and cut into batches of batch_size, so
+    each batch is only padded to its own longest sequence and little of
+    it is padding. Each batch comes with the lengths to pass to
+    sequence_rnn, which then also stops computing finished sequences.
+
+    Parameters:
+        sequences (list): List of numpy.ndarray of shape (t_k, i), one per
+            sequence, of any lengths t_k
+        batch_size (int): Maximum number of sequences per batch
+        shuffle (bool): Whether to shuffle the order of the batches; the
+            sequences inside a batch keep similar lengths either way
+        seed (int): Seed of the shuffle
+
+    Yields:
+        X (numpy.ndarray): Batch of shape (t, m, i), zero padded
+            t: length of the longest sequence of the batch
+            m: number of sequences in the batch
+        lengths (numpy.ndarray): Shape (m,) containing the length of each
+            sequence of the batch
+        indices (numpy.ndarray): Shape (m,) containing the index of each
+            sequence of the batch in sequences
+    """
+    all_lengths = np.array([len(seq) for seq in sequences])
+    by_length = np.argsort(all_lengths, kind='stable')
+
+    batches = [by_length[start:start + batch_size]
+               for start in range(0, len(sequences), batch_size)]
+
+    if shuffle:
+        np.random.default_rng(seed).shuffle(batches)
+
+    for indices in batches:
+        lengths = all_lengths[indices]
+        first = sequences[indices[0]]
+
+        X = np.zeros((np.max(lengths), len(indices)) + first.shape[1:],
+                     dtype=first.dtype)
+        for k, index in enumerate(indices):
+            X[:lengths[k], k] = sequences[index]
+
+        yield X, lengths, indices
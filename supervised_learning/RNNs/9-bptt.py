@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Module containing truncated back propagation through time for stacks of
+RNNCell, FusedGRUCell and FusedLSTMCell, and a trainer built on it.
+"""
+
+import numpy as np
+
+
+def forward_segment(cells, X, h_0, c_0):
+    """
+    Runs the cells over a segment, keeping what back propagation needs.
+
+    Only the inputs, the projected inputs and the states are kept; the
+    gates are recomputed by each cell's step_backward.
+
+    Parameters:
+        cells (list): List of l trainable cells
+        X (numpy.ndarray): Input data of shape (k, m, i)
+        h_0 (numpy.ndarray): Hidden states of shape (l, m, h) at the start
+        c_0 (numpy.ndarray): Cell states of shape (l, m, h) at the start,
+            ignored by layers without a cell state
+
+    Returns:
+        list of (inputs, xw, H, C) per layer, where H and C have shape
+        (k + 1, m, h) and start with the given states
+    """
+    k, m, _ = X.shape
+    caches = []
+    layer_input = X
+
+    for layer, cell in enumerate(cells):
+        xw = cell.project(layer_input)
+        H = np.empty((k + 1,) + h_0.shape[1:])
+        C = np.zeros((k + 1,) + h_0.shape[1:])
+        H[0] = h_0[layer]
+        C[0] = c_0[layer]
+
+        for step in range(k):
+            if getattr(cell, 'cell_state', False):
+                H[step + 1], C[step + 1] = cell.step(H[step], C[step],
+                                                     xw[step])
+            else:
+                H[step + 1] = cell.step(H[step], xw[step])
+
+        caches.append((layer_input, xw, H, C))
+        layer_input = H[1:]
+
+    return caches
+
+
+def backward_segment(cells, caches, dH_top, dh, dc, grads):
+    """
+    Back propagates through a segment run by forward_segment.
+
+    Parameters:
+        cells (list): List of l trainable cells
+        caches (list): Output of forward_segment
+        dH_top (numpy.ndarray): Shape (k, m, h), gradient of the hidden
+            states of the top layer through the outputs
+        dh (numpy.ndarray): Shape (l, m, h), gradient of the hidden states
+            at the end of the segment; overwritten with the gradient at
+            its start
+        dc (numpy.ndarray): Shape (l, m, h), same for the cell states
+        grads (list): Gradients of each cell by parameter name,
+            accumulated in place
+    """
+    dH = dH_top
+
+    for layer in reversed(range(len(cells))):
+        cell = cells[layer]
+        layer_input, xw, H, C = caches[layer]
+        dxw = np.empty_like(xw)
+
+        for step in reversed(range(xw.shape[0])):
+            dh_next = dH[step] + dh[layer]
+
+            if getattr(cell, 'cell_state', False):
+                dh[layer], dc[layer], dxw[step] = cell.step_backward(
+                    grads[layer], H[step], C[step], xw[step], dh_next,
+                    dc[layer]
+                )
+            else:
+                dh[layer], dxw[step] = cell.step_backward(
+                    grads[layer], H[step], xw[step], dh_next
+                )
+
+        # Gradient of the hidden states of the layer below
+        dH = cell.project_backward(grads[layer], layer_input, dxw)
+
+
+def bptt(cells, X, Y, h_0, c_0=None, checkpoint=None):
+    """
+    Back propagation through time over one window of a sequence.
+
+    The softmax outputs of the top layer are trained with the categorical
+    cross-entropy, averaged over the time steps and the batch. Without
+    checkpoint, every state of the window is kept. With checkpoint=k,
+    only the states every k steps are kept on a first forward pass, and
+    each segment of k steps is run again just before back propagating
+    through it, so memory grows with t / k + k instead of t.
+
+    Parameters:
+        cells (list): List of l cells with step_backward, e.g. RNNCell,
+            FusedGRUCell and FusedLSTMCell; GRUCell and LSTMCell can be
+            converted with FusedGRUCell.from_cell and
+            FusedLSTMCell.from_cell
+        X (numpy.ndarray): Input data of shape (t, m, i)
+        Y (numpy.ndarray): One-hot labels of shape (t, m, o)
+        h_0 (numpy.ndarray): Initial hidden state of shape (l, m, h)
+        c_0 (numpy.ndarray): Initial cell state of shape (l, m, h); zeros
+            if None
+        checkpoint (int): Number of time steps between stored states
+
+    Returns:
+        cost (float): Mean cross-entropy of the window
+        grads (list): Gradients of each cell by parameter name
+        h_t (numpy.ndarray): Hidden states of shape (l, m, h) at the end
+        c_t (numpy.ndarray): Cell states of shape (l, m, h) at the end
+    """
+    t, m, _ = X.shape
+    k = t if checkpoint is None else checkpoint
+    if c_0 is None:
+        c_0 = np.zeros(h_0.shape)
+
+    # States at the start of each segment
+    starts = list(range(0, t, k))
+    states = [(h_0, c_0)]
+    for start in starts[:-1]:
+        caches = forward_segment(cells, X[start:start + k], *states[-1])
+        states.append((np.array([cache[2][-1] for cache in caches]),
+                       np.array([cache[3][-1] for cache in caches])))
+
+    grads = [{name: np.zeros_like(param)
+              for name, param in cell.parameters().items()}
+             for cell in cells]
+    dh = np.zeros(h_0.shape)
+    dc = np.zeros(h_0.shape)
+    cost = 0
+    top = cells[-1]
+
+    for start, state in reversed(list(zip(starts, states))):
+        caches = forward_segment(cells, X[start:start + k], *state)
+
+        if start == starts[-1]:
+            h_t = np.array([cache[2][-1] for cache in caches])
+            c_t = np.array([cache[3][-1] for cache in caches])
+
+        # Softmax cross-entropy of the top layer
+        H_top = caches[-1][2][1:]
+        Y_seg = Y[start:start + k]
+        Y_hat = top.output(H_top)
+        cost -= np.sum(Y_seg * np.log(Y_hat + 1e-12))
+
+        dZ = (Y_hat - Y_seg) / (t * m)
+        grads[-1]['Wy'] += np.tensordot(H_top, dZ, axes=([0, 1], [0, 1]))
+        grads[-1]['by'] += np.sum(dZ, axis=(0, 1))
+
+        backward_segment(cells, caches, np.matmul(dZ, top.Wy.T), dh, dc,
+                         grads)
+
+    return cost / (t * m), grads, h_t, c_t
+
+
+def clip_gradients(grads, max_norm):
+    """
+    Scales gradients in place so that their global norm is at most
+    max_norm.
+
+    Parameters:
+        grads (list): Gradients of each cell by parameter name
+        max_norm (float): Maximum global L2 norm
+
+    Returns:
+        float: Global norm before clipping
+    """
+    norm = np.sqrt(sum(np.sum(g ** 2) for cell_grads in grads
+                       for g in cell_grads.values()))
+
+    if norm > max_norm:
+        for cell_grads in grads:
+            for g in cell_grads.values():
+                g *= max_norm / norm
+
+    return norm
+
+
+class BPTTTrainer:
+    """
+    Trains a stack of cells with truncated back propagation through time.
+    """
+
+    def __init__(self, cells, alpha=0.01, truncate=None, checkpoint=None,
+                 clip=5.0):
+        """
+        Class constructor for BPTTTrainer.
+
+        Parameters:
+            cells (list): List of cells with step_backward, updated in place
+            alpha (float): Learning rate of gradient descent
+            truncate (int): Length of the windows sequences are cut into;
+                the states carry over from one window to the next but
+                gradients do not. Whole sequences if None
+            checkpoint (int): Number of time steps between stored states
+                inside a window, see bptt
+            clip (float): Maximum global gradient norm, or None
+        """
+        self.cells = cells
+        self.alpha = alpha
+        self.truncate = truncate
+        self.checkpoint = checkpoint
+        self.clip = clip
+
+    def train_batch(self, X, Y, h_0=None, c_0=None):
+        """
+        Performs one update per window of a batch of sequences.
+
+        Parameters:
+            X (numpy.ndarray): Input data of shape (t, m, i)
+            Y (numpy.ndarray): One-hot labels of shape (t, m, o)
+            h_0 (numpy.ndarray): Initial hidden state of shape (l, m, h);
+                zeros if None
+            c_0 (numpy.ndarray): Initial cell state of shape (l, m, h);
+                zeros if None
+
+        Returns:
+            cost (float): Mean cost of the windows
+            h_t (numpy.ndarray): Hidden states at the end of the batch
+            c_t (numpy.ndarray): Cell states at the end of the batch
+        """
+        t, m, _ = X.shape
+        if h_0 is None:
+            h = self.cells[0].Wy.shape[0]
+            h_0 = np.zeros((len(self.cells), m, h))
+
+        window = t if self.truncate is None else self.truncate
+        costs = []
+
+        for start in range(0, t, window):
+            cost, grads, h_0, c_0 = bptt(
+                self.cells, X[start:start + window], Y[start:start + window],
+                h_0, c_0, self.checkpoint
+            )
+            costs.append(cost)
+
+            if self.clip is not None:
+                clip_gradients(grads, self.clip)
+
+            for cell, cell_grads in zip(self.cells, grads):
+                for name, param in cell.parameters().items():
+                    param -= self.alpha * cell_grads[name]
+
+        return np.mean(costs), h_0, c_0
+
+    def train(self, batches, epochs=1, verbose=True):
+        """
+        Trains over a list of batches.
+
+        Parameters:
+            batches (list): List of (X, Y) pairs as taken by train_batch
+            epochs (int): Number of passes through the batches
+            verbose (bool): Whether to print the cost after every epoch
+
+        Returns:
+            list of the mean cost of every epoch
+        """
+        history = []
+
+        for epoch in range(epochs):
+            cost = np.mean([self.train_batch(X, Y)[0] for X, Y in batches])
+            history.append(cost)
+
+            if verbose:
+                print('Epoch {}: cost {}'.format(epoch + 1, cost))
+
+        return history
@@ -2,6 +2,7 @@
 """
 Transformer Decoder Module
 """
+import numpy as np
 import tensorflow as tf
 positional_encoding = __import__('4-positional_encoding').positional_encoding
 DecoderBlock = __import__('8-transformer_decoder_block').DecoderBlock
@@ -12,7 +13,7 @@ class Decoder(tf.keras.layers.Layer):
     Class Decoder to create the decoder for a transformer
     """
     def __init__(self, N, dm, h, hidden, target_vocab, max_seq_len,
-                 drop_rate=0.1):
+                 drop_rate=0.1, chunk_size=None):
         """
         Class constructor
 
@@ -24,18 +25,37 @@ class Decoder(tf.keras.layers.Layer):
             target_vocab (int): Size of the target vocabulary
             max_seq_len (int): Maximum sequence length possible
             drop_rate (float): Dropout rate
+            chunk_size (int): Number of positions per tile of the chunked
+                              attention, or None for the whole attention
         """
         super(Decoder, self).__init__()
         self.N = N
         self.dm = dm
         self.embedding = tf.keras.layers.Embedding(target_vocab, dm)
-        self.positional_encoding = positional_encoding(max_seq_len, dm)
+        self.positional_encoding = positional_encoding(
+            max_seq_len, dm, np.float32
+        )
         self.blocks = [
-            DecoderBlock(dm, h, hidden, drop_rate) for _ in range(N)
+            DecoderBlock(dm, h, hidden, drop_rate, chunk_size)
+            for _ in range(N)
         ]
         self.dropout = tf.keras.layers.Dropout(drop_rate)
 
-    def call(self, x, encoder_output, training, look_ahead_mask, padding_mask):
+    def init_cache(self):
+        """
+        Creates an empty cache for incremental decoding
+
+        Returns:
+            dict holding the number of positions decoded so far and the
+            cache of every block
+        """
+        return {
+            'length': 0,
+            'blocks': [block.init_cache() for block in self.blocks]
+        }
+
+    def call(self, x, encoder_output, training, look_ahead_mask, padding_mask,
+             cache=None):
         """
         Executes the decoder computation graph
 
@@ -46,11 +66,18 @@ class Decoder(tf.keras.layers.Layer):
             training: Boolean determining if model is training
             look_ahead_mask: Mask for the first multi-head attention layer
             padding_mask: Mask for the second multi-head attention layer
+            cache: Optional dict from init_cache for incremental decoding;
+                   x then holds only the positions following those already
+                   decoded, and look_ahead_mask applies among them only
+                   (None for a single position)
 
         Returns:
             Tensor of shape (batch, target_seq_len, dm) containing decoder output
+            If a cache was given, also returns the updated cache for the
+            next step
         """
         seq_len = tf.shape(x)[1]
+        start = 0 if cache is None else cache['length']
 
         # 1. Target embedding lookups
         x = self.embedding(x)
@@ -59,14 +86,26 @@ class Decoder(tf.keras.layers.Layer):
         x *= tf.math.sqrt(tf.cast(self.dm, tf.float32))
 
         # 3. Add positional encodings for the sequence length
-        x += self.positional_encoding[:seq_len]
+        x += self.positional_encoding[start:start + seq_len]
 
         # 4. Apply initial dropout
         x = self.dropout(x, training=training)
 
         # 5. Pass sequentially through N DecoderBlock layers
-        for block in self.blocks:
-            x = block(x, encoder_output, training,
-                      look_ahead_mask, padding_mask)
+        if cache is None:
+            for block in self.blocks:
+                x = block(x, encoder_output, training,
+                          look_ahead_mask, padding_mask)
+
+            return x
+
+        # Caches mix tensors and ints, which Layer.__call__ may reject or
+        # copy, so the cached path calls the blocks directly
+        blocks = []
+        for block, block_cache in zip(self.blocks, cache['blocks']):
+            x, block_cache = block.call(x, encoder_output, training,
+                                        look_ahead_mask, padding_mask,
+                                        cache=block_cache)
+            blocks.append(block_cache)
 
-        return x
+        return x, {'length': start + x.shape[1], 'blocks': blocks}
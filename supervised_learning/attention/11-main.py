@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import tensorflow as tf
+
+Transformer = __import__('11-transformer').Transformer
+
+tf.random.set_seed(0)
+transformer = Transformer(2, 32, 4, 64, 20, 20, 32, 32)
+
+inputs = tf.constant([[18, 3, 4, 5, 19, 0], [18, 7, 8, 19, 0, 0]])
+target = tf.constant([[18, 5, 6, 7, 8, 9], [18, 3, 2, 19, 0, 0]])
+encoder_mask = tf.cast(tf.math.equal(inputs, 0),
+                       tf.float32)[:, tf.newaxis, tf.newaxis, :]
+
+encoder_output = transformer.encode(inputs, encoder_mask)
+print(encoder_output.shape)
+
+# The whole target in one step, with a look-ahead mask
+full, _ = transformer.decode_step(target, encoder_output, encoder_mask,
+                                  transformer.init_cache())
+
+# One token at a time from the cache
+cache = transformer.init_cache()
+steps = []
+for i in range(target.shape[1]):
+    logits, cache = transformer.decode_step(target[:, i:i + 1],
+                                            encoder_output, encoder_mask,
+                                            cache)
+    steps.append(logits)
+
+print(cache['length'])
+print(np.allclose(full, tf.concat(steps, axis=1), atol=1e-5))
@@ -12,7 +12,8 @@ class Transformer(tf.keras.Model):
     Class Transformer to create a full Transformer network
     """
     def __init__(self, N, dm, h, hidden, input_vocab, target_vocab,
-                 max_seq_input, max_seq_target, drop_rate=0.1):
+                 max_seq_input, max_seq_target, drop_rate=0.1,
+                 chunk_size=None):
         """
         Class constructor
 
@@ -26,13 +27,17 @@ class Transformer(tf.keras.Model):
             max_seq_input (int): Maximum sequence length for input
             max_seq_target (int): Maximum sequence length for target
             drop_rate (float): Dropout rate
+            chunk_size (int): Number of positions per tile of the chunked
+                              attention, or None for the whole attention
         """
         super(Transformer, self).__init__()
         self.encoder = Encoder(
-            N, dm, h, hidden, input_vocab, max_seq_input, drop_rate
+            N, dm, h, hidden, input_vocab, max_seq_input, drop_rate,
+            chunk_size
         )
         self.decoder = Decoder(
-            N, dm, h, hidden, target_vocab, max_seq_target, drop_rate
+            N, dm, h, hidden, target_vocab, max_seq_target, drop_rate,
+            chunk_size
         )
         self.linear = tf.keras.layers.Dense(units=target_vocab)
 
@@ -61,3 +66,61 @@ class Transformer(tf.keras.Model):
         final_output = self.linear(dec_output)
 
         return final_output
+
+    def encode(self, inputs, encoder_mask, training=False):
+        """
+        Runs the encoder once for a batch of sources
+
+        Args:
+            inputs: Tensor of shape (batch, input_seq_len) containing inputs
+            encoder_mask: Padding mask to be applied to the encoder
+            training: Boolean determining if model is training
+
+        Returns:
+            Tensor of shape (batch, input_seq_len, dm), to be passed to
+            every decode_step for these sources
+        """
+        return self.encoder(inputs, training=training, mask=encoder_mask)
+
+    def init_cache(self):
+        """
+        Creates an empty cache for incremental decoding
+
+        Returns:
+            dict to be passed to decode_step
+        """
+        return self.decoder.init_cache()
+
+    def decode_step(self, target, enc_output, decoder_mask, cache):
+        """
+        Decodes the positions following those already in the cache
+
+        Only the new positions go through the decoder: the keys and values
+        of earlier positions, and those of the encoder output, come from
+        the cache, so generating L tokens costs L single-position passes
+
+        Args:
+            target: Tensor of shape (batch, new_len) containing the newest
+                    target tokens, usually new_len = 1
+            enc_output: Output of encode for the same sources
+            decoder_mask: Padding mask applied to 2nd MHA layer in decoder
+            cache: dict from init_cache or from the previous decode_step
+
+        Returns:
+            Tensor of shape (batch, new_len, target_vocab), and the cache
+            to pass to the next decode_step
+        """
+        new_len = tf.shape(target)[1]
+        look_ahead_mask = None
+        if target.shape[1] != 1:
+            # New positions attend to all cached ones and earlier new ones
+            look_ahead_mask = 1 - tf.linalg.band_part(
+                tf.ones((new_len, cache['length'] + new_len)), -1,
+                cache['length']
+            )
+
+        dec_output, cache = self.decoder.call(target, enc_output, False,
+                                              look_ahead_mask, decoder_mask,
+                                              cache=cache)
+
+        return self.linear(dec_output), cache
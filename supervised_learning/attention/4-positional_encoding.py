@@ -2,25 +2,39 @@
 """Module containing the positional_encoding function."""
 import numpy as np
 
+# Positional encoding tables keyed by (max_seq_len, dm, dtype)
+TABLES = {}
 
-def positional_encoding(max_seq_len, dm):
+
+def positional_encoding(max_seq_len, dm, dtype=np.float64):
     """Calculates the positional encoding for a transformer.
 
+    Each table is computed once and shared by later calls with the same
+    arguments, so it is returned read-only.
+
     Args:
         max_seq_len (int): Maximum sequence length.
         dm (int): Model depth (d_model).
+        dtype (np.dtype): Data type of the table.
 
     Returns:
         np.ndarray: Array of shape (max_seq_len, dm) containing
             positional encoding vectors.
     """
-    PE = np.zeros((max_seq_len, dm))
-    pos = np.arange(max_seq_len)[:, np.newaxis]
-    i = np.arange(dm)[np.newaxis, :]
+    key = (max_seq_len, dm, np.dtype(dtype))
+
+    if key not in TABLES:
+        PE = np.zeros((max_seq_len, dm))
+        pos = np.arange(max_seq_len)[:, np.newaxis]
+        i = np.arange(dm)[np.newaxis, :]
+
+        div_term = 10000 ** (2 * (i // 2) / dm)
 
-    div_term = 10000 ** (2 * (i // 2) / dm)
+        PE[:, 0::2] = np.sin(pos / div_term[:, 0::2])
+        PE[:, 1::2] = np.cos(pos / div_term[:, 1::2])
 
-    PE[:, 0::2] = np.sin(pos / div_term[:, 0::2])
-    PE[:, 1::2] = np.cos(pos / div_term[:, 1::2])
+        PE = PE.astype(dtype)
+        PE.flags.writeable = False
+        TABLES[key] = PE
 
-    return PE
+    return TABLES[key]
@@ -3,31 +3,172 @@
 import tensorflow as tf
 
 
-def sdp_attention(Q, K, V, mask=None):
+def mask_tile(mask, q_start, q_end, k_start, k_end):
+    """Slices the part of a mask applying to one tile of the logits.
+
+    Args:
+        mask (tf.Tensor): Mask tensor broadcastable to
+            (..., seq_len_q, seq_len_v).
+        q_start, q_end: Query positions of the tile.
+        k_start, k_end: Key positions of the tile.
+
+    Returns:
+        tf.Tensor: The mask of the tile; axes the mask broadcasts along
+            are kept whole.
+    """
+    rows = tf.shape(mask)[-2]
+    cols = tf.shape(mask)[-1]
+
+    # A broadcast axis of size 1 is sliced as [0:1] whatever the tile
+    q_start = tf.where(rows == 1, 0, q_start)
+    q_end = tf.where(rows == 1, 1, q_end)
+    k_start = tf.where(cols == 1, 0, k_start)
+    k_end = tf.where(cols == 1, 1, k_end)
+
+    return mask[..., q_start:q_end, k_start:k_end]
+
+
+def sdp_attention(Q, K, V, mask=None, chunk_size=None, return_weights=True):
     """Calculates the scaled dot product attention.
 
+    With chunk_size, the queries and keys are processed in tiles of
+    chunk_size positions and the softmax is computed online, as in
+    FlashAttention: each query tile keeps a running row maximum, a
+    running sum of exponentials and a running weighted sum of V, which
+    are rescaled whenever a new key tile raises the maximum. Only
+    (..., chunk_size, chunk_size) logits exist at a time, so memory grows
+    linearly with the sequence length, unless the weights are requested.
+    The tiles are iterated with tf.while_loop over the dynamic shapes, so
+    the graph does not grow with the sequence length and works with
+    sequences padded to any length. Each query tile is wrapped in
+    tf.recompute_grad, so a backward pass keeps only the tile inputs and
+    recomputes its key tiles instead of storing their activations.
+
     Args:
         Q (tf.Tensor): Query matrix with shape (..., seq_len_q, dk).
         K (tf.Tensor): Key matrix with shape (..., seq_len_v, dk).
         V (tf.Tensor): Value matrix with shape (..., seq_len_v, dv).
         mask (tf.Tensor, optional): Mask tensor broadcastable to
             (..., seq_len_q, seq_len_v). Defaults to None.
+        chunk_size (int, optional): Number of positions per tile, or None
+            to compute the whole attention at once. Defaults to None.
+        return_weights (bool, optional): Whether to compute and return
+            the attention weights. Defaults to True.
 
     Returns:
         output (tf.Tensor): Scaled dot product attention tensor with
             shape (..., seq_len_q, dv).
         weights (tf.Tensor): Attention weights tensor with shape
-            (..., seq_len_q, seq_len_v).
+            (..., seq_len_q, seq_len_v), or None if not return_weights.
     """
-    matmul_qk = tf.matmul(Q, K, transpose_b=True)
-
     dk = tf.cast(tf.shape(K)[-1], tf.float32)
-    scaled_attention_logits = matmul_qk / tf.math.sqrt(dk)
 
-    if mask is not None:
-        scaled_attention_logits += (mask * -1e9)
+    if chunk_size is None:
+        matmul_qk = tf.matmul(Q, K, transpose_b=True)
+        scaled_attention_logits = matmul_qk / tf.math.sqrt(dk)
+
+        if mask is not None:
+            scaled_attention_logits += (mask * -1e9)
+
+        weights = tf.nn.softmax(scaled_attention_logits, axis=-1)
+        output = tf.matmul(weights, V)
+
+        return output, weights if return_weights else None
+
+    seq_len_q = tf.shape(Q)[-2]
+    seq_len_v = tf.shape(K)[-2]
+    num_q_tiles = (seq_len_q + chunk_size - 1) // chunk_size
+    num_k_tiles = (seq_len_v + chunk_size - 1) // chunk_size
+
+    # Query tiles are stacked along the first axis, so that the last,
+    # shorter tile concatenates with the others
+    rank = Q.shape.rank
+    perm = [rank - 2] + list(range(rank - 2)) + [rank - 1]
+    inverse = list(range(1, rank - 1)) + [0, rank - 1]
+
+    @tf.recompute_grad
+    def tile_softmax(q, k, v, *mask_rows):
+        """Online softmax of one tile of queries over every key tile.
+
+        Only the inputs are kept for the backward pass: the key tiles are
+        run again to compute the gradient, so training memory stays
+        linear in the sequence length too.
+        """
+        def key_tile(j, row_max, row_sum, acc):
+            """Folds one tile of keys into the running softmax."""
+            k_start = j * chunk_size
+            k_end = tf.minimum(k_start + chunk_size, seq_len_v)
+            logits = tf.matmul(q, k[..., k_start:k_end, :], transpose_b=True)
+
+            if mask_rows:
+                logits += mask_tile(mask_rows[0], 0, tf.shape(q)[-2],
+                                    k_start, k_end) * -1e9
+
+            new_max = tf.maximum(
+                row_max, tf.reduce_max(logits, axis=-1, keepdims=True)
+            )
+            exp_logits = tf.exp(logits - new_max)
+
+            # Rescale what was accumulated under the old maximum
+            scale = tf.exp(row_max - new_max)
+            row_sum = row_sum * scale + tf.reduce_sum(
+                exp_logits, axis=-1, keepdims=True
+            )
+            acc = acc * scale + tf.matmul(exp_logits, v[..., k_start:k_end, :])
+
+            return j + 1, new_max, row_sum, acc
+
+        # Running maximum, sum of exponentials and output of the tile
+        rows = tf.concat([tf.shape(q)[:-1], [1]], axis=0)
+        state = (
+            tf.constant(0),
+            tf.fill(rows, tf.constant(-float('inf'), Q.dtype)),
+            tf.zeros(rows, Q.dtype),
+            tf.zeros(tf.concat([tf.shape(q)[:-1], tf.shape(v)[-1:]], axis=0),
+                     Q.dtype)
+        )
+        unknown = tf.TensorShape(None)
+        _, row_max, row_sum, acc = tf.while_loop(
+            lambda j, *_: j < num_k_tiles, key_tile, state,
+            shape_invariants=(tf.TensorShape([]), unknown, unknown, unknown)
+        )
+
+        return acc / row_sum, row_max, row_sum
+
+    def query_tile(i, outputs, weight_rows):
+        """Attention of one tile of queries over every key tile."""
+        q_start = i * chunk_size
+        q_end = tf.minimum(q_start + chunk_size, seq_len_q)
+        q = Q[..., q_start:q_end, :] / tf.math.sqrt(dk)
+
+        mask_rows = ()
+        if mask is not None:
+            mask_rows = (mask_tile(mask, q_start, q_end, 0, seq_len_v),)
+        output, row_max, row_sum = tile_softmax(q, K, V, *mask_rows)
+
+        outputs = outputs.write(i, tf.transpose(output, perm))
+
+        if return_weights:
+            # One (..., chunk_size, seq_len_v) slab, normalized with the
+            # final statistics of the tile
+            logits = tf.matmul(q, K, transpose_b=True)
+            if mask_rows:
+                logits += mask_rows[0] * -1e9
+            weight_rows = weight_rows.write(
+                i, tf.transpose(tf.exp(logits - row_max) / row_sum, perm)
+            )
+
+        return i + 1, outputs, weight_rows
+
+    _, outputs, weight_rows = tf.while_loop(
+        lambda i, *_: i < num_q_tiles, query_tile,
+        (tf.constant(0),
+         tf.TensorArray(Q.dtype, size=num_q_tiles, infer_shape=False),
+         tf.TensorArray(Q.dtype, size=num_q_tiles, infer_shape=False))
+    )
 
-    weights = tf.nn.softmax(scaled_attention_logits, axis=-1)
-    output = tf.matmul(weights, V)
+    output = tf.transpose(outputs.concat(), inverse)
+    if not return_weights:
+        return output, None
 
-    return output, weights
+    return output, tf.transpose(weight_rows.concat(), inverse)
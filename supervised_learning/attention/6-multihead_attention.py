@@ -11,18 +11,22 @@ class MultiHeadAttention(tf.keras.layers.Layer):
     """
     Class MultiHeadAttention to perform multi-head attention
     """
-    def __init__(self, dm, h):
+    def __init__(self, dm, h, chunk_size=None):
         """
         Class constructor
 
         Args:
             dm (int): Dimensionality of the model
             h (int): Number of heads
+            chunk_size (int): Number of positions per tile of the chunked
+                              attention, see sdp_attention; None computes
+                              the whole attention at once
         """
         super(MultiHeadAttention, self).__init__()
         self.h = h
         self.dm = dm
         self.depth = dm // h
+        self.chunk_size = chunk_size
 
         self.Wq = tf.keras.layers.Dense(units=dm)
         self.Wk = tf.keras.layers.Dense(units=dm)
@@ -38,7 +42,56 @@ class MultiHeadAttention(tf.keras.layers.Layer):
         x = tf.reshape(x, (batch_size, -1, self.h, self.depth))
         return tf.transpose(x, perm=[0, 2, 1, 3])
 
-    def call(self, Q, K, V, mask):
+    def project_kv(self, K, V, batch_size):
+        """
+        Projects K and V and splits them into heads
+
+        Args:
+            K: Tensor of shape (batch, seq_len_v, dk)
+            V: Tensor of shape (batch, seq_len_v, dv)
+            batch_size: Batch size
+
+        Returns:
+            k, v: Tensors of shape (batch, h, seq_len_v, depth)
+        """
+        k = self.split_heads(self.Wk(K), batch_size)
+        v = self.split_heads(self.Wv(V), batch_size)
+
+        return k, v
+
+    def project_qkv(self, X, batch_size):
+        """
+        Projects X into queries, keys and values with one GEMM
+
+        The kernels and biases of Wq, Wk and Wv are concatenated into one
+        (dm, 3 * dm) projection, whose output is split into the three
+        sets of heads by a single reshape and transpose. The weights stay
+        those of the three Dense layers, so saved weights load either way
+
+        Args:
+            X: Tensor of shape (batch, seq_len, dm), the Q, K and V of
+               self-attention
+            batch_size: Batch size
+
+        Returns:
+            q, k, v: Tensors of shape (batch, h, seq_len, depth)
+        """
+        layers = (self.Wq, self.Wk, self.Wv)
+        for layer in layers:
+            if not layer.built:
+                layer.build(X.shape)
+
+        kernel = tf.concat([layer.kernel for layer in layers], axis=1)
+        bias = tf.concat([layer.bias for layer in layers], axis=0)
+
+        qkv = tf.matmul(X, kernel) + bias  # (batch_size, seq_len, 3 * dm)
+        qkv = tf.reshape(qkv, (batch_size, -1, 3, self.h, self.depth))
+        qkv = tf.transpose(qkv, perm=[2, 0, 3, 1, 4])
+
+        return qkv[0], qkv[1], qkv[2]
+
+    def call(self, Q, K, V, mask, cache=None, static_kv=False,
+             return_weights=True):
         """
         Executes multi-head attention over the inputs Q, K, V
 
@@ -47,29 +100,59 @@ class MultiHeadAttention(tf.keras.layers.Layer):
             K: Tensor of shape (batch, seq_len_v, dk)
             V: Tensor of shape (batch, seq_len_v, dv)
             mask: Always None or a mask tensor
+            cache: Optional dict holding the projected keys and values
+                   (batch, h, seq_len, depth) of earlier calls, for
+                   incremental decoding; empty on the first call. It is
+                   not modified: the updated cache is returned instead
+            static_kv: If True, K and V are the same at every call (the
+                       encoder output in cross-attention): they are
+                       projected on the first call only and read from the
+                       cache afterwards. If False, the keys and values of
+                       K and V are appended to those already cached
+            return_weights: Whether to compute the attention weights;
+                            callers that discard them should pass False
+
+        When Q, K and V are the same tensor, as in self-attention, the
+        three projections run fused, see project_qkv
 
         Returns:
             output: Tensor containing scaled dot-product attention
                     with last dimensions (..., seq_len_q, dm)
             weights: Tensor containing attention weights
-                    with last dimensions (..., h, seq_len_q, seq_len_v)
+                    with last dimensions (..., h, seq_len_q, seq_len_v),
+                    or None if not return_weights
+            cache: Only if a cache was given, the dict of the keys and
+                   values to pass to the next call
         """
         batch_size = tf.shape(Q)[0]
 
-        # Pass Q, K, V through linear projections
-        q = self.Wq(Q)  # (batch_size, seq_len_q, dm)
-        k = self.Wk(K)  # (batch_size, seq_len_v, dm)
-        v = self.Wv(V)  # (batch_size, seq_len_v, dm)
-
-        # Split projections into multiple heads
-        q = self.split_heads(q, batch_size)  # (batch_size, h, seq_len_q, depth)
-        k = self.split_heads(k, batch_size)  # (batch_size, h, seq_len_v, depth)
-        v = self.split_heads(v, batch_size)  # (batch_size, h, seq_len_v, depth)
+        if Q is K and K is V and not static_kv:
+            # Self-attention: one projection for queries, keys and values
+            q, k, v = self.project_qkv(Q, batch_size)
+        else:
+            # Pass Q through its linear projection and split it into heads
+            q = self.Wq(Q)  # (batch_size, seq_len_q, dm)
+            # (batch_size, h, seq_len_q, depth)
+            q = self.split_heads(q, batch_size)
+
+            k = v = None
+            if cache is None or not static_kv or 'k' not in cache:
+                k, v = self.project_kv(K, V, batch_size)
+
+        if k is None:
+            # Keys and values of a fixed K, V projected by an earlier call
+            k, v = cache['k'], cache['v']
+        elif cache is not None and 'k' in cache:
+            # Extend the keys and values of the earlier positions
+            k = tf.concat([cache['k'], k], axis=2)
+            v = tf.concat([cache['v'], v], axis=2)
 
         # Apply scaled dot product attention on split heads
         # output shape: (batch_size, h, seq_len_q, depth)
         # weights shape: (batch_size, h, seq_len_q, seq_len_v)
-        scaled_attention, weights = sdp_attention(q, k, v, mask)
+        scaled_attention, weights = sdp_attention(
+            q, k, v, mask, self.chunk_size, return_weights
+        )
 
         # Transpose back: (batch_size, seq_len_q, h, depth)
         scaled_attention = tf.transpose(scaled_attention, perm=[0, 2, 1, 3])
@@ -80,4 +163,7 @@ class MultiHeadAttention(tf.keras.layers.Layer):
         # Pass concatenated output through final linear projection
         output = self.linear(concat_attention)  # (batch_size, seq_len_q, dm)
 
+        if cache is not None:
+            return output, weights, {'k': k, 'v': v}
+
         return output, weights
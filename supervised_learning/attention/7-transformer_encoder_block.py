@@ -10,7 +10,7 @@ class EncoderBlock(tf.keras.layers.Layer):
     """
     Class EncoderBlock to create an encoder block for a transformer
     """
-    def __init__(self, dm, h, hidden, drop_rate=0.1):
+    def __init__(self, dm, h, hidden, drop_rate=0.1, chunk_size=None):
         """
         Class constructor
 
@@ -19,9 +19,11 @@ class EncoderBlock(tf.keras.layers.Layer):
             h (int): Number of heads
             hidden (int): Number of hidden units in fully connected layer
             drop_rate (float): Dropout rate
+            chunk_size (int): Number of positions per tile of the chunked
+                              attention, or None for the whole attention
         """
         super(EncoderBlock, self).__init__()
-        self.mha = MultiHeadAttention(dm, h)
+        self.mha = MultiHeadAttention(dm, h, chunk_size)
         self.dense_hidden = tf.keras.layers.Dense(
             units=hidden, activation='relu'
         )
@@ -43,7 +45,7 @@ class EncoderBlock(tf.keras.layers.Layer):
         Returns:
             Tensor of shape (batch, input_seq_len, dm) with the block's output
         """
-        attn_output, _ = self.mha(x, x, x, mask)
+        attn_output, _ = self.mha(x, x, x, mask, return_weights=False)
         attn_output = self.dropout1(attn_output, training=training)
         out1 = self.layernorm1(x + attn_output)
 
@@ -10,7 +10,7 @@ class DecoderBlock(tf.keras.layers.Layer):
     """
     Class DecoderBlock to create a decoder block for a transformer
     """
-    def __init__(self, dm, h, hidden, drop_rate=0.1):
+    def __init__(self, dm, h, hidden, drop_rate=0.1, chunk_size=None):
         """
         Class constructor
 
@@ -19,10 +19,12 @@ class DecoderBlock(tf.keras.layers.Layer):
             h (int): Number of heads
             hidden (int): Number of hidden units in the fully connected layer
             drop_rate (float): Dropout rate
+            chunk_size (int): Number of positions per tile of the chunked
+                              attention, or None for the whole attention
         """
         super(DecoderBlock, self).__init__()
-        self.mha1 = MultiHeadAttention(dm, h)
-        self.mha2 = MultiHeadAttention(dm, h)
+        self.mha1 = MultiHeadAttention(dm, h, chunk_size)
+        self.mha2 = MultiHeadAttention(dm, h, chunk_size)
         self.dense_hidden = tf.keras.layers.Dense(
             units=hidden, activation='relu'
         )
@@ -34,7 +36,17 @@ class DecoderBlock(tf.keras.layers.Layer):
         self.dropout2 = tf.keras.layers.Dropout(drop_rate)
         self.dropout3 = tf.keras.layers.Dropout(drop_rate)
 
-    def call(self, x, encoder_output, training, look_ahead_mask, padding_mask):
+    def init_cache(self):
+        """
+        Creates an empty cache for incremental decoding
+
+        Returns:
+            dict of the self-attention and cross-attention caches
+        """
+        return {'self': {}, 'cross': {}}
+
+    def call(self, x, encoder_output, training, look_ahead_mask, padding_mask,
+             cache=None):
         """
         Executes the decoder block computation graph
 
@@ -46,21 +58,40 @@ class DecoderBlock(tf.keras.layers.Layer):
             training: Boolean determining if the model is training
             look_ahead_mask: Mask to be applied to the first MHA layer
             padding_mask: Mask to be applied to the second MHA layer
+            cache: Optional dict for incremental decoding, as returned by
+                   init_cache; x then holds only the newest positions,
+                   which attend to the cached earlier ones, and the
+                   encoder keys and values are projected on the first
+                   step only
 
         Returns:
             Tensor of shape (batch, target_seq_len, dm) containing block output
+            If a cache was given, also returns the updated cache for the
+            next step
         """
         # 1. Masked Multi-Head Self-Attention
-        attn1, _ = self.mha1(x, x, x, look_ahead_mask)
+        if cache is None:
+            attn1, _ = self.mha1(x, x, x, look_ahead_mask,
+                                 return_weights=False)
+        else:
+            attn1, _, self_cache = self.mha1.call(
+                x, x, x, look_ahead_mask, cache=cache['self'],
+                return_weights=False
+            )
         attn1 = self.dropout1(attn1, training=training)
         out1 = self.layernorm1(x + attn1)
 
         # 2. Encoder-Decoder Cross Attention
         # Queries come from previous sub-layer (out1)
         # Keys and Values come from encoder output
-        attn2, _ = self.mha2(
-            out1, encoder_output, encoder_output, padding_mask
-        )
+        if cache is None:
+            attn2, _ = self.mha2(out1, encoder_output, encoder_output,
+                                 padding_mask, return_weights=False)
+        else:
+            attn2, _, cross_cache = self.mha2.call(
+                out1, encoder_output, encoder_output, padding_mask,
+                cache=cache['cross'], static_kv=True, return_weights=False
+            )
         attn2 = self.dropout2(attn2, training=training)
         out2 = self.layernorm2(out1 + attn2)
 
@@ -70,4 +101,7 @@ class DecoderBlock(tf.keras.layers.Layer):
         ffn_output = self.dropout3(ffn_output, training=training)
         out3 = self.layernorm3(out2 + ffn_output)
 
+        if cache is not None:
+            return out3, {'self': self_cache, 'cross': cross_cache}
+
         return out3
@@ -2,6 +2,7 @@
 """
 Transformer Encoder Module
 """
+import numpy as np
 import tensorflow as tf
 positional_encoding = __import__('4-positional_encoding').positional_encoding
 EncoderBlock = __import__('7-transformer_encoder_block').EncoderBlock
@@ -12,7 +13,7 @@ class Encoder(tf.keras.layers.Layer):
     Class Encoder to create the encoder for a transformer
     """
     def __init__(self, N, dm, h, hidden, input_vocab, max_seq_len,
-                 drop_rate=0.1):
+                 drop_rate=0.1, chunk_size=None):
         """
         Class constructor
 
@@ -24,14 +25,19 @@ class Encoder(tf.keras.layers.Layer):
             input_vocab (int): Size of the input vocabulary
             max_seq_len (int): Maximum sequence length possible
             drop_rate (float): Dropout rate
+            chunk_size (int): Number of positions per tile of the chunked
+                              attention, or None for the whole attention
         """
         super(Encoder, self).__init__()
         self.N = N
         self.dm = dm
         self.embedding = tf.keras.layers.Embedding(input_vocab, dm)
-        self.positional_encoding = positional_encoding(max_seq_len, dm)
+        self.positional_encoding = positional_encoding(
+            max_seq_len, dm, np.float32
+        )
         self.blocks = [
-            EncoderBlock(dm, h, hidden, drop_rate) for _ in range(N)
+            EncoderBlock(dm, h, hidden, drop_rate, chunk_size)
+            for _ in range(N)
         ]
         self.dropout = tf.keras.layers.Dropout(drop_rate)
 
@@ -63,6 +69,6 @@ class Encoder(tf.keras.layers.Layer):
 
         # Pass through N EncoderBlocks
         for block in self.blocks:
-            x = block(x, training, mask)
+            x = block(x, training=training, mask=mask)
 
         return x
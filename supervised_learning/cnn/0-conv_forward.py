@@ -5,29 +5,54 @@ Module to perform forward propagation over a convolutional layer.
 
 import numpy as np
 
+batch_parallel = __import__('cnn_engine').batch_parallel
+check_groups = __import__('cnn_engine').check_groups
+conv_gemm = __import__('cnn_engine').conv_gemm
+pad = __import__('cnn_engine').pad
+resolve_dtype = __import__('cnn_engine').resolve_dtype
 
-def conv_forward(A_prev, W, b, activation, padding="same", stride=(1, 1)):
+
+def conv_forward(A_prev, W, b, activation, padding="same", stride=(1, 1),
+                 workspace=None, dtype=None, groups=1, workers=1):
     """
     Performs forward propagation over a convolutional layer.
 
     Args:
         A_prev: numpy.ndarray of shape (m, h_prev, w_prev, c_prev) containing
                 the output of the previous layer
-        W: numpy.ndarray of shape (kh, kw, c_prev, c_new) containing
-           the kernels for the convolution
+        W: numpy.ndarray of shape (kh, kw, c_prev // groups, c_new)
+           containing the kernels for the convolution
         b: numpy.ndarray of shape (1, 1, 1, c_new) containing
            the biases applied to the convolution
         activation: activation function applied to the convolution
         padding: string that is either "same" or "valid"
         stride: tuple of (sh, sw) containing the strides for the convolution
+        workspace: optional Workspace reused for the padded input
+        dtype: dtype of the results, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
+        groups: number of channel groups; each group of c_prev // groups
+                input channels feeds its own c_new // groups output
+                channels, and groups == c_prev is a depthwise convolution
+        workers: number of threads the batch is split across; the
+                 output is the same whatever the number of workers
 
     Returns:
         The output of the convolutional layer
     """
     m, h_prev, w_prev, c_prev = A_prev.shape
     kh, kw, _, c_new = W.shape
+    check_groups(c_prev, W, groups)
     sh, sw = stride
 
+    if workers > 1 and m > 1:
+        def shard(A_prev, workspace):
+            """Forward propagation over one slice of the batch"""
+            return conv_forward(A_prev, W, b, activation, padding, stride,
+                                workspace, dtype, groups)
+
+        return np.concatenate(batch_parallel(shard, [A_prev], workers,
+                                             workspace))
+
     if padding == "same":
         ph = int(np.ceil(((h_prev - 1) * sh + kh - h_prev) / 2))
         pw = int(np.ceil(((w_prev - 1) * sw + kw - w_prev) / 2))
@@ -35,29 +60,11 @@ def conv_forward(A_prev, W, b, activation, padding="same", stride=(1, 1)):
         ph = 0
         pw = 0
 
-    A_pad = np.pad(
-        A_prev,
-        pad_width=((0, 0), (ph, ph), (pw, pw), (0, 0)),
-        mode='constant'
-    )
-
-    h_out = int((h_prev + 2 * ph - kh) / sh) + 1
-    w_out = int((w_prev + 2 * pw - kw) / sw) + 1
-
-    Z = np.zeros((m, h_out, w_out, c_new))
-
-    for i in range(h_out):
-        for j in range(w_out):
-            for k in range(c_new):
-                v_start = i * sh
-                v_end = v_start + kh
-                h_start = j * sw
-                h_end = h_start + kw
+    dtype, acc = resolve_dtype(dtype, A_prev, W, b)
+    A_pad = pad(A_prev.astype(acc, copy=False), (ph, pw), workspace)
 
-                a_slice = A_pad[:, v_start:v_end, h_start:h_end, :]
-                kernel = W[:, :, :, k]
-                Z[:, i, j, k] = (
-                    np.sum(a_slice * kernel, axis=(1, 2, 3)) + b[0, 0, 0, k]
-                )
+    # Single GEMM over all windows (one per group): -> (m, h_out, w_out, c_new)
+    Z = conv_gemm(A_pad, W.astype(acc, copy=False), stride, groups)
+    Z = Z + b.astype(acc, copy=False)
 
-    return activation(Z)
+    return activation(Z).astype(dtype, copy=False)
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+conv_forward = __import__('0-conv_forward').conv_forward
+Workspace = __import__('cnn_engine').Workspace
+
+rng = np.random.default_rng(0)
+A_a = rng.random((4, 10, 10, 2))
+A_b = rng.random((4, 8, 8, 2))
+W_3 = rng.random((3, 3, 2, 3))
+W_5 = rng.random((5, 5, 2, 3))
+b = rng.random((1, 1, 1, 3))
+
+# Both calls pad to 12x12; the second must not see the first's data
+ws = Workspace()
+conv_forward(A_a, W_3, b, np.tanh, padding='same', workspace=ws)
+print(np.allclose(
+    conv_forward(A_b, W_5, b, np.tanh, padding='same', workspace=ws),
+    conv_forward(A_b, W_5, b, np.tanh, padding='same')
+))
@@ -3,8 +3,14 @@
 
 import numpy as np
 
+batch_parallel = __import__('cnn_engine').batch_parallel
+pool_windows = __import__('cnn_engine').pool_windows
+max_pool_argmax = __import__('cnn_engine').max_pool_argmax
+resolve_dtype = __import__('cnn_engine').resolve_dtype
 
-def pool_forward(A_prev, kernel_shape, stride=(1, 1), mode='max'):
+
+def pool_forward(A_prev, kernel_shape, stride=(1, 1), mode='max',
+                 return_argmax=False, dtype=None, workers=1):
     """
     Performs forward propagation over a pooling layer
 
@@ -13,32 +19,49 @@ def pool_forward(A_prev, kernel_shape, stride=(1, 1), mode='max'):
         kernel_shape: (kh, kw)
         stride: (sh, sw)
         mode: 'max' or 'avg'
+        return_argmax: if True with max pooling, also return the flat
+                       index of the maximum inside each window, which
+                       pool_backward can reuse
+        dtype: dtype of the output, by default that of A_prev;
+               float16 averages are accumulated in float32
+        workers: number of threads the batch is split across; the
+                 output is the same whatever the number of workers
 
     Returns:
-        pooled output
+        pooled output, and the argmax indices if return_argmax is True
     """
-    m, h_prev, w_prev, c_prev = A_prev.shape
-    kh, kw = kernel_shape
-    sh, sw = stride
+    if workers > 1 and A_prev.shape[0] > 1:
+        def shard(A_prev, workspace):
+            """Forward propagation over one slice of the batch"""
+            return pool_forward(A_prev, kernel_shape, stride, mode,
+                                return_argmax, dtype)
 
-    # Output size
-    h_out = (h_prev - kh) // sh + 1
-    w_out = (w_prev - kw) // sw + 1
+        results = batch_parallel(shard, [A_prev], workers)
+        if return_argmax:
+            # Only max pooling has argmax indices, None otherwise
+            argmax = None
+            if mode == 'max':
+                argmax = np.concatenate([r[1] for r in results])
+            return np.concatenate([r[0] for r in results]), argmax
+        return np.concatenate(results)
 
-    # Initialize output
-    output = np.zeros((m, h_out, w_out, c_prev))
+    dtype, acc = resolve_dtype(dtype, A_prev)
+    windows = pool_windows(A_prev, kernel_shape, stride)
+    argmax = None
 
-    # --- Pooling (2 loops only) ---
-    for i in range(h_out):
-        for j in range(w_out):
-            row = i * sh
-            col = j * sw
+    # --- Pooling (every window at once) ---
+    if mode == 'max' and return_argmax:
+        output, argmax = max_pool_argmax(windows)
+    elif mode == 'max':
+        output = np.max(windows, axis=(4, 5))
+    elif mode == 'avg':
+        output = np.mean(windows, axis=(4, 5), dtype=acc)
+    else:
+        output = np.zeros(windows.shape[:4])
 
-            region = A_prev[:, row:row+kh, col:col+kw, :]  # (m, kh, kw, c)
+    output = output.astype(dtype, copy=False)
 
-            if mode == 'max':
-                output[:, i, j, :] = np.max(region, axis=(1, 2))
-            elif mode == 'avg':
-                output[:, i, j, :] = np.mean(region, axis=(1, 2))
+    if return_argmax:
+        return output, argmax
 
     return output
@@ -5,8 +5,15 @@ Module to perform back propagation over a convolutional layer.
 
 import numpy as np
 
+batch_parallel = __import__('cnn_engine').batch_parallel
+check_groups = __import__('cnn_engine').check_groups
+conv_gemm_backward = __import__('cnn_engine').conv_gemm_backward
+pad = __import__('cnn_engine').pad
+resolve_dtype = __import__('cnn_engine').resolve_dtype
 
-def conv_backward(dZ, A_prev, W, b, padding="same", stride=(1, 1)):
+
+def conv_backward(dZ, A_prev, W, b, padding="same", stride=(1, 1),
+                  workspace=None, dtype=None, groups=1, workers=1):
     """
     Performs back propagation over a convolutional layer of a neural network.
 
@@ -16,12 +23,20 @@ def conv_backward(dZ, A_prev, W, b, padding="same", stride=(1, 1)):
             of the convolutional layer
         A_prev: numpy.ndarray of shape (m, h_prev, w_prev, c_prev) containing
                 the output of the previous layer
-        W: numpy.ndarray of shape (kh, kw, c_prev, c_new) containing
-           the kernels for the convolution
+        W: numpy.ndarray of shape (kh, kw, c_prev // groups, c_new)
+           containing the kernels for the convolution
         b: numpy.ndarray of shape (1, 1, 1, c_new) containing
            the biases applied to the convolution
         padding: string that is either "same" or "valid"
         stride: tuple of (sh, sw) containing the strides for the convolution
+        workspace: optional Workspace reused for the padded input and its
+                   gradient; dA_prev is then a view into the workspace
+        dtype: dtype of the results, by default that of the inputs;
+               float16 is computed in float32 and stored as float16
+        groups: number of channel groups, as in conv_forward
+        workers: number of threads the batch is split across; dW and db
+                 sum the slices in batch order, so they are reproducible
+                 for a given number of workers
 
     Returns:
         tuple: (dA_prev, dW, db)
@@ -32,6 +47,7 @@ def conv_backward(dZ, A_prev, W, b, padding="same", stride=(1, 1)):
     m, h_new, w_new, c_new = dZ.shape
     m, h_prev, w_prev, c_prev = A_prev.shape
     kh, kw, _, _ = W.shape
+    check_groups(c_prev, W, groups)
     sh, sw = stride
 
     if padding == "same":
@@ -41,31 +57,34 @@ def conv_backward(dZ, A_prev, W, b, padding="same", stride=(1, 1)):
         ph = 0
         pw = 0
 
-    A_pad = np.pad(
-        A_prev,
-        pad_width=((0, 0), (ph, ph), (pw, pw), (0, 0)),
-        mode='constant'
-    )
-    dA_pad = np.zeros_like(A_pad)
-    dW = np.zeros_like(W)
-    db = np.sum(dZ, axis=(0, 1, 2), keepdims=True)
+    dtype, acc = resolve_dtype(dtype, dZ, A_prev, W)
+
+    if workers > 1 and m > 1:
+        def shard(dZ, A_prev, workspace):
+            """Back propagation over one slice of the batch"""
+            return conv_backward(dZ, A_prev, W, b, padding, stride,
+                                 workspace, acc, groups)
 
-    for i in range(h_new):
-        for j in range(w_new):
-            for k in range(c_new):
-                v_start = i * sh
-                v_end = v_start + kh
-                h_start = j * sw
-                h_end = h_start + kw
+        grads = batch_parallel(shard, [dZ, A_prev], workers, workspace)
+        dA_prev = np.concatenate([g[0] for g in grads])
+        dW = sum(g[1] for g in grads)
+        db = sum(g[2] for g in grads)
 
-                dz = dZ[:, i:i + 1, j:j + 1, k:k + 1]
-                a_slice = A_pad[:, v_start:v_end, h_start:h_end, :]
+        return (dA_prev.astype(dtype, copy=False),
+                dW.astype(dtype, copy=False), db.astype(dtype, copy=False))
+
+    dZ = dZ.astype(acc, copy=False)
+    W = W.astype(acc, copy=False)
+
+    A_pad = pad(A_prev.astype(acc, copy=False), (ph, pw), workspace)
+    db = np.sum(dZ, axis=(0, 1, 2), keepdims=True)
 
-                dA_pad[:, v_start:v_end, h_start:h_end, :] += (
-                    W[:, :, :, k] * dz
-                )
-                dW[:, :, :, k] += np.sum(a_slice * dz, axis=0)
+    dA_pad = None
+    if workspace is not None:
+        dA_pad = workspace.zeros('dA_pad', A_pad.shape, dZ.dtype)
+    dA_pad, dW = conv_gemm_backward(dZ, A_pad, W, stride, groups, dA_pad)
 
     dA_prev = dA_pad[:, ph:ph + h_prev, pw:pw + w_prev, :]
 
-    return dA_prev, dW, db
+    return (dA_prev.astype(dtype, copy=False), dW.astype(dtype, copy=False),
+            db.astype(dtype, copy=False))
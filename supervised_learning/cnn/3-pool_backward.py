@@ -3,64 +3,81 @@
 
 import numpy as np
 
+batch_parallel = __import__('cnn_engine').batch_parallel
+pool_windows = __import__('cnn_engine').pool_windows
+pool_scatter = __import__('cnn_engine').pool_scatter
+argmax_scatter = __import__('cnn_engine').argmax_scatter
+resolve_dtype = __import__('cnn_engine').resolve_dtype
 
-def pool_backward(dA, A_prev, kernel_shape, stride=(1, 1), mode='max'):
+
+def pool_backward(dA, A_prev, kernel_shape, stride=(1, 1), mode='max',
+                  argmax=None, workspace=None, dtype=None, workers=1):
     """
     Performs backpropagation over a pooling layer
+
+    Args:
+        dA: (m, h_new, w_new, c) partial derivatives with respect to the
+            output of the pooling layer
+        A_prev: (m, h_prev, w_prev, c) output of the previous layer
+        kernel_shape: (kh, kw)
+        stride: (sh, sw)
+        mode: 'max' or 'avg'
+        argmax: optional argmax indices cached by
+                pool_forward(..., return_argmax=True); with max pooling
+                they avoid searching every window for its maximum again
+        workspace: optional Workspace providing the returned gradient
+                   buffer, which the next call reusing it overwrites
+        dtype: dtype of the result, by default that of dA and A_prev;
+               float16 averages are accumulated in float32
+        workers: number of threads the batch is split across; the
+                 result is the same whatever the number of workers
+
+    Returns:
+        partial derivatives with respect to the previous layer
     """
-    m, h_prev, w_prev, c = A_prev.shape
     kh, kw = kernel_shape
-    sh, sw = stride
 
-    _, h_new, w_new, _ = dA.shape
+    if workers > 1 and A_prev.shape[0] > 1:
+        def shard(dA, A_prev, argmax, workspace):
+            """Back propagation over one slice of the batch"""
+            return pool_backward(dA, A_prev, kernel_shape, stride, mode,
+                                 argmax, workspace, dtype)
+
+        return np.concatenate(batch_parallel(
+            shard, [dA, A_prev, argmax], workers, workspace))
 
-    dA_prev = np.zeros_like(A_prev)
+    dtype, acc = resolve_dtype(dtype, dA, A_prev)
+    dA = dA.astype(acc, copy=False)
+
+    out = None
+    if workspace is not None:
+        out = workspace.zeros('dA_prev', A_prev.shape, acc)
 
     # -----------------------
     # MAX POOLING BACKPROP
     # -----------------------
-    if mode == "max":
-
-        for i in range(h_new):
-            for j in range(w_new):
-
-                row = i * sh
-                col = j * sw
+    if mode == "max" and argmax is not None:
+        dA_prev = argmax_scatter(dA, argmax, A_prev.shape,
+                                 kernel_shape, stride, out)
 
-                for n in range(m):
-                    for ch in range(c):
+    elif mode == "max":
+        windows = pool_windows(A_prev, kernel_shape, stride)
+        mask = windows == np.max(windows, axis=(4, 5), keepdims=True)
 
-                        a_slice = A_prev[n,
-                                         row:row + kh,
-                                         col:col + kw,
-                                         ch]
-
-                        mask = (a_slice == np.max(a_slice))
-
-                        dA_prev[n,
-                                row:row + kh,
-                                col:col + kw,
-                                ch] += mask * dA[n, i, j, ch]
+        dA_prev = pool_scatter(mask * dA[..., np.newaxis, np.newaxis],
+                               A_prev.shape, stride, out)
 
     # -----------------------
     # AVG POOLING BACKPROP
     # -----------------------
     elif mode == "avg":
-
         da_val = dA / (kh * kw)
+        cols = np.broadcast_to(da_val[..., np.newaxis, np.newaxis],
+                               dA.shape + (kh, kw))
 
-        for i in range(h_new):
-            for j in range(w_new):
-
-                row = i * sh
-                col = j * sw
-
-                for n in range(m):
-                    for ch in range(c):
+        dA_prev = pool_scatter(cols, A_prev.shape, stride, out)
 
-                        dA_prev[n,
-                                row:row + kh,
-                                col:col + kw,
-                                ch] += da_val[n, i, j, ch]
+    else:
+        dA_prev = np.zeros(A_prev.shape, acc) if out is None else out
 
-    return dA_prev
+    return dA_prev.astype(dtype, copy=False)
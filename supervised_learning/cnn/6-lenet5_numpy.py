@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+"""LeNet-5 architecture trained with the NumPy convolution primitives"""
+
+import time
+
+import numpy as np
+
+conv_forward = __import__('0-conv_forward').conv_forward
+pool_forward = __import__('1-pool_forward').pool_forward
+conv_backward = __import__('2-conv_backward').conv_backward
+pool_backward = __import__('3-pool_backward').pool_backward
+Workspace = __import__('cnn_engine').Workspace
+
+
+def he_normal(rng, shape, fan_in, dtype):
+    """
+    He normal initialization
+
+    Args:
+        rng: numpy.random.Generator
+        shape: shape of the weights
+        fan_in: number of inputs of each unit
+        dtype: dtype of the weights
+
+    Returns:
+        numpy.ndarray of the given shape
+    """
+    return (rng.standard_normal(shape) * np.sqrt(2 / fan_in)).astype(dtype)
+
+
+class Conv2D:
+    """Convolutional layer with a ReLU activation"""
+
+    def __init__(self, c_prev, c_new, kernel_shape, padding='same',
+                 stride=(1, 1), rng=None, dtype=np.float32, groups=1):
+        """
+        Class constructor
+
+        Args:
+            c_prev: number of input channels
+            c_new: number of kernels
+            kernel_shape: (kh, kw)
+            padding: 'same' or 'valid'
+            stride: (sh, sw)
+            rng: numpy.random.Generator used for initialization
+            dtype: dtype of the parameters and activations
+            groups: number of channel groups, c_prev for a depthwise layer
+        """
+        kh, kw = kernel_shape
+        rng = np.random.default_rng(0) if rng is None else rng
+
+        self.W = he_normal(rng, (kh, kw, c_prev // groups, c_new),
+                           kh * kw * c_prev // groups, dtype)
+        self.b = np.zeros((1, 1, 1, c_new), dtype=dtype)
+        self.params = [self.W, self.b]
+        self.grads = [np.zeros_like(self.W), np.zeros_like(self.b)]
+
+        self.padding = padding
+        self.stride = stride
+        self.groups = groups
+        self.workspace = Workspace()
+        self.cache = None
+
+    def forward(self, A_prev, training=False):
+        """
+        Forward propagation
+
+        Args:
+            A_prev: numpy.ndarray (m, h_prev, w_prev, c_prev)
+            training: whether to cache the activations for backward
+
+        Returns:
+            numpy.ndarray (m, h_new, w_new, c_new)
+        """
+        Z = conv_forward(A_prev, self.W, self.b, lambda z: z,
+                         self.padding, self.stride, self.workspace,
+                         groups=self.groups)
+        A = np.maximum(Z, 0)
+
+        if training:
+            self.cache = (A_prev, Z > 0)
+
+        return A
+
+    def backward(self, dA):
+        """
+        Back propagation, storing the parameter gradients in self.grads
+
+        Args:
+            dA: numpy.ndarray (m, h_new, w_new, c_new)
+
+        Returns:
+            numpy.ndarray (m, h_prev, w_prev, c_prev)
+        """
+        A_prev, active = self.cache
+
+        dA_prev, dW, db = conv_backward(dA * active, A_prev, self.W,
+                                        self.b, self.padding, self.stride,
+                                        self.workspace, groups=self.groups)
+        self.grads[0][...] = dW
+        self.grads[1][...] = db
+
+        return dA_prev
+
+
+class MaxPool2D:
+    """Max pooling layer"""
+
+    def __init__(self, kernel_shape, stride):
+        """
+        Class constructor
+
+        Args:
+            kernel_shape: (kh, kw)
+            stride: (sh, sw)
+        """
+        self.kernel_shape = kernel_shape
+        self.stride = stride
+        self.params = []
+        self.grads = []
+        self.workspace = Workspace()
+        self.cache = None
+
+    def forward(self, A_prev, training=False):
+        """
+        Forward propagation
+
+        Args:
+            A_prev: numpy.ndarray (m, h_prev, w_prev, c)
+            training: whether to cache the argmax indices for backward
+
+        Returns:
+            numpy.ndarray (m, h_new, w_new, c)
+        """
+        A, argmax = pool_forward(A_prev, self.kernel_shape, self.stride,
+                                 return_argmax=True)
+
+        if training:
+            self.cache = (A_prev, argmax)
+
+        return A
+
+    def backward(self, dA):
+        """
+        Back propagation
+
+        Args:
+            dA: numpy.ndarray (m, h_new, w_new, c)
+
+        Returns:
+            numpy.ndarray (m, h_prev, w_prev, c)
+        """
+        A_prev, argmax = self.cache
+
+        return pool_backward(dA, A_prev, self.kernel_shape, self.stride,
+                             argmax=argmax, workspace=self.workspace)
+
+
+class Flatten:
+    """Flattens every sample to a vector"""
+
+    def __init__(self):
+        """Class constructor"""
+        self.params = []
+        self.grads = []
+        self.shape = None
+
+    def forward(self, A_prev, training=False):
+        """
+        Forward propagation
+
+        Args:
+            A_prev: numpy.ndarray (m, ...)
+            training: unused, for a uniform layer interface
+
+        Returns:
+            numpy.ndarray (m, n)
+        """
+        self.shape = A_prev.shape
+
+        return A_prev.reshape(A_prev.shape[0], -1)
+
+    def backward(self, dA):
+        """
+        Back propagation
+
+        Args:
+            dA: numpy.ndarray (m, n)
+
+        Returns:
+            numpy.ndarray of the shape of the forward input
+        """
+        return dA.reshape(self.shape)
+
+
+class Dense:
+    """Fully connected layer with a ReLU or softmax activation"""
+
+    def __init__(self, n_prev, n, activation='relu', rng=None,
+                 dtype=np.float32):
+        """
+        Class constructor
+
+        Args:
+            n_prev: number of inputs
+            n: number of units
+            activation: 'relu' or 'softmax'; the gradient given to
+                        backward of a softmax layer is taken to be the
+                        gradient of the cross-entropy with respect to Z
+            rng: numpy.random.Generator used for initialization
+            dtype: dtype of the parameters and activations
+        """
+        rng = np.random.default_rng(0) if rng is None else rng
+
+        self.W = he_normal(rng, (n_prev, n), n_prev, dtype)
+        self.b = np.zeros((1, n), dtype=dtype)
+        self.params = [self.W, self.b]
+        self.grads = [np.zeros_like(self.W), np.zeros_like(self.b)]
+
+        self.activation = activation
+        self.cache = None
+
+    def forward(self, A_prev, training=False):
+        """
+        Forward propagation
+
+        Args:
+            A_prev: numpy.ndarray (m, n_prev)
+            training: whether to cache the activations for backward
+
+        Returns:
+            numpy.ndarray (m, n)
+        """
+        Z = A_prev @ self.W + self.b
+
+        if self.activation == 'softmax':
+            exp = np.exp(Z - np.max(Z, axis=1, keepdims=True))
+            A = exp / np.sum(exp, axis=1, keepdims=True)
+            active = None
+        else:
+            A = np.maximum(Z, 0)
+            active = Z > 0
+
+        if training:
+            self.cache = (A_prev, active)
+
+        return A
+
+    def backward(self, dA):
+        """
+        Back propagation, storing the parameter gradients in self.grads
+
+        Args:
+            dA: numpy.ndarray (m, n)
+
+        Returns:
+            numpy.ndarray (m, n_prev)
+        """
+        A_prev, active = self.cache
+        dZ = dA if active is None else dA * active
+
+        np.matmul(A_prev.T, dZ, out=self.grads[0])
+        np.sum(dZ, axis=0, keepdims=True, out=self.grads[1])
+
+        return dZ @ self.W.T
+
+
+class Adam:
+    """Adam optimizer with preallocated moment buffers"""
+
+    def __init__(self, params, alpha=0.001, beta1=0.9, beta2=0.999,
+                 epsilon=1e-7):
+        """
+        Class constructor
+
+        Args:
+            params: list of parameter arrays updated in place
+            alpha: learning rate
+            beta1: weight of the first moment
+            beta2: weight of the second moment
+            epsilon: small number to avoid division by zero
+        """
+        self.params = params
+        self.alpha = alpha
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.epsilon = epsilon
+        self.v = [np.zeros_like(p) for p in params]
+        self.s = [np.zeros_like(p) for p in params]
+        self.t = 0
+
+    def step(self, grads):
+        """
+        Updates the parameters in place
+
+        Args:
+            grads: list of gradients matching self.params
+        """
+        self.t += 1
+        alpha = self.alpha * (np.sqrt(1 - self.beta2 ** self.t)
+                              / (1 - self.beta1 ** self.t))
+
+        for p, g, v, s in zip(self.params, grads, self.v, self.s):
+            v *= self.beta1
+            v += (1 - self.beta1) * g
+            s *= self.beta2
+            s += (1 - self.beta2) * g * g
+            p -= alpha * v / (np.sqrt(s) + self.epsilon)
+
+
+class Sequential:
+    """Chains layers into a trainable model"""
+
+    def __init__(self, layers):
+        """
+        Class constructor
+
+        Args:
+            layers: list of layers, the last one a softmax Dense layer
+        """
+        self.layers = layers
+        self.params = [p for layer in layers for p in layer.params]
+        self.grads = [g for layer in layers for g in layer.grads]
+        self.optimizer = None
+
+    def forward(self, X, training=False):
+        """
+        Forward propagation through every layer
+
+        Args:
+            X: numpy.ndarray input of the first layer
+            training: whether the layers cache activations for backward
+
+        Returns:
+            numpy.ndarray output of the last layer
+        """
+        A = X
+        for layer in self.layers:
+            A = layer.forward(A, training)
+        return A
+
+    def backward(self, Y_hat, Y):
+        """
+        Back propagation of the categorical cross-entropy
+
+        Args:
+            Y_hat: numpy.ndarray (m, classes) softmax output
+            Y: numpy.ndarray (m, classes) one-hot labels
+        """
+        dA = (Y_hat - Y) / Y.shape[0]
+        for layer in reversed(self.layers):
+            dA = layer.backward(dA)
+
+    def predict(self, X, batch_size=256):
+        """
+        Predicts in mini-batches
+
+        Args:
+            X: numpy.ndarray input data
+            batch_size: number of samples per forward pass
+
+        Returns:
+            numpy.ndarray (m, classes) of softmax outputs
+        """
+        return np.concatenate([
+            self.forward(X[i:i + batch_size])
+            for i in range(0, X.shape[0], batch_size)
+        ])
+
+    def train(self, X, Y, batch_size=32, epochs=5, alpha=0.001,
+              shuffle=True, verbose=True, seed=0):
+        """
+        Trains the model with mini-batch Adam
+
+        Args:
+            X: numpy.ndarray input data
+            Y: numpy.ndarray (m, classes) one-hot labels
+            batch_size: number of samples per mini-batch
+            epochs: number of passes through the data
+            alpha: learning rate
+            shuffle: whether to shuffle the data every epoch
+            verbose: whether to print the cost after every epoch
+            seed: seed of the shuffling
+
+        Returns:
+            list of the mean cost of every epoch
+        """
+        if self.optimizer is None:
+            self.optimizer = Adam(self.params, alpha)
+
+        rng = np.random.default_rng(seed)
+        m = X.shape[0]
+        history = []
+
+        for epoch in range(epochs):
+            order = rng.permutation(m) if shuffle else np.arange(m)
+            total = 0
+
+            for i in range(0, m, batch_size):
+                batch = order[i:i + batch_size]
+                X_batch, Y_batch = X[batch], Y[batch]
+
+                Y_hat = self.forward(X_batch, training=True)
+                total += -np.sum(Y_batch * np.log(Y_hat + 1e-12))
+
+                self.backward(Y_hat, Y_batch)
+                self.optimizer.step(self.grads)
+
+            history.append(total / m)
+            if verbose:
+                print('Epoch {}: cost {}'.format(epoch + 1, history[-1]))
+
+        return history
+
+
+def lenet5(dtype=np.float32, seed=0):
+    """
+    Builds the modified LeNet-5 of 5-lenet5.py with NumPy layers
+
+    Args:
+        dtype: dtype of the parameters and activations
+        seed: seed of the He normal initialization
+
+    Returns:
+        Sequential model taking (m, 28, 28, 1) images
+    """
+    rng = np.random.default_rng(seed)
+
+    return Sequential([
+        Conv2D(1, 6, (5, 5), 'same', rng=rng, dtype=dtype),
+        MaxPool2D((2, 2), (2, 2)),
+        Conv2D(6, 16, (5, 5), 'valid', rng=rng, dtype=dtype),
+        MaxPool2D((2, 2), (2, 2)),
+        Flatten(),
+        Dense(400, 120, 'relu', rng=rng, dtype=dtype),
+        Dense(120, 84, 'relu', rng=rng, dtype=dtype),
+        Dense(84, 10, 'softmax', rng=rng, dtype=dtype)
+    ])
+
+
+def images_per_second(predict, X, batch_size=256, repeats=3):
+    """
+    Measures inference throughput
+
+    Args:
+        predict: function mapping a batch of images to predictions
+        X: numpy.ndarray of images
+        batch_size: number of images per call
+        repeats: number of timed passes, the fastest is kept
+
+    Returns:
+        number of images per second
+    """
+    best = np.inf
+
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(0, X.shape[0], batch_size):
+            predict(X[i:i + batch_size])
+        best = min(best, time.perf_counter() - start)
+
+    return X.shape[0] / best
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+
+import numpy as np
+from tensorflow import keras as K
+
+lenet5_keras = __import__('5-lenet5').lenet5
+lenet5_numpy = __import__('6-lenet5_numpy').lenet5
+images_per_second = __import__('6-lenet5_numpy').images_per_second
+
+X = np.random.default_rng(0).random((2048, 28, 28, 1), dtype=np.float32)
+
+keras_model = lenet5_keras(K.Input(shape=(28, 28, 1)))
+numpy_model = lenet5_numpy()
+
+print('Keras: {:.0f} images/sec'.format(images_per_second(
+    lambda x: keras_model(x, training=False), X)))
+print('NumPy: {:.0f} images/sec'.format(images_per_second(
+    numpy_model.predict, X)))
@@ -0,0 +1,521 @@
+#!/usr/bin/env python3
+"""Vectorized kernels shared by the convolutional layer functions
+
+Workspace, pad, resolve_dtype and pool_windows mirror Workspace,
+pad_images, resolve_dtype and pool_windows of
+math/convolutions_and_pooling/conv_engine.py, plus the per-thread child
+workspaces used here. Every project directory is self-contained: its files
+are loaded with __import__ from their own directory, which is the only one
+on the path, so neither engine can import the other. A fix to one copy
+belongs in both
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Thread pools shared by every call, keyed by their number of workers
+EXECUTORS = {}
+
+
+class Workspace:
+    """
+    Arena of preallocated buffers keyed by name, shape and dtype
+
+    Passing the same workspace to successive calls reuses its buffers
+    instead of allocating new ones. Arrays returned by a call that used a
+    workspace may be overwritten by the next call using it, so keep one
+    workspace per layer and copy results that must outlive the step.
+    """
+
+    def __init__(self):
+        """Initializes an empty workspace"""
+        self.buffers = {}
+        self.children = []
+
+    def workers(self, n):
+        """
+        Returns one child workspace per worker thread
+
+        Workers each get their own buffers so they never write to the
+        same array; the children persist so later calls reuse them
+
+        Args:
+            n: number of workers
+
+        Returns:
+            list of n Workspace instances
+        """
+        while len(self.children) < n:
+            self.children.append(Workspace())
+        return self.children[:n]
+
+    def empty(self, name, shape, dtype=float):
+        """
+        Returns the buffer for (name, shape, dtype), allocating it once
+
+        Args:
+            name: purpose of the buffer, so equal shapes do not collide
+            shape: shape of the buffer
+            dtype: dtype of the buffer
+
+        Returns:
+            numpy.ndarray with unspecified contents
+        """
+        key = (name, tuple(shape), np.dtype(dtype))
+        if key not in self.buffers:
+            self.buffers[key] = np.zeros(shape, dtype=dtype)
+        return self.buffers[key]
+
+    def zeros(self, name, shape, dtype=float):
+        """
+        Returns the buffer for (name, shape, dtype) filled with zeros
+
+        Args:
+            name: purpose of the buffer
+            shape: shape of the buffer
+            dtype: dtype of the buffer
+
+        Returns:
+            numpy.ndarray of zeros
+        """
+        buffer = self.empty(name, shape, dtype)
+        buffer.fill(0)
+        return buffer
+
+    def pad(self, name, A, padding):
+        """
+        Writes A into the interior of a zero-bordered buffer
+
+        The buffer is keyed by the padding as well as its shape, so every
+        call writing into it has the same interior; only the interior is
+        ever written, and the border allocated as zeros stays zero
+
+        Args:
+            name: purpose of the buffer
+            A: numpy.ndarray (m, h, w, c)
+            padding: (ph, pw) zero padding applied to each side
+
+        Returns:
+            numpy.ndarray (m, h + 2 * ph, w + 2 * pw, c)
+        """
+        m, h, w, c = A.shape
+        ph, pw = padding
+
+        # Same padded shape from another padding would leave stale data
+        # in the border
+        buffer = self.empty((name, ph, pw), (m, h + 2 * ph, w + 2 * pw, c),
+                            A.dtype)
+        buffer[:, ph:ph + h, pw:pw + w] = A
+        return buffer
+
+
+def pad(A, padding, workspace=None, name='A_pad'):
+    """
+    Zero pads the spatial dimensions of A
+
+    Args:
+        A: numpy.ndarray (m, h, w, c)
+        padding: (ph, pw) zero padding applied to each side
+        workspace: optional Workspace providing the padded buffer
+        name: name of the buffer in the workspace
+
+    Returns:
+        numpy.ndarray (m, h + 2 * ph, w + 2 * pw, c)
+    """
+    ph, pw = padding
+
+    if not (ph or pw):
+        return A
+
+    if workspace is not None:
+        return workspace.pad(name, A, padding)
+
+    return np.pad(
+        A,
+        pad_width=((0, 0), (ph, ph), (pw, pw), (0, 0)),
+        mode='constant'
+    )
+
+
+def resolve_dtype(dtype, *arrays):
+    """
+    Storage and accumulation dtypes of a computation
+
+    Args:
+        dtype: requested storage dtype, or None to keep the floating dtype
+               of the inputs (float64 for integer inputs)
+        arrays: inputs of the computation
+
+    Returns:
+        dtype: dtype of the results
+        acc: dtype the computation runs in; at least float32, so that
+             float16 storage accumulates in float32
+    """
+    if dtype is None:
+        dtype = np.result_type(*arrays)
+        if not np.issubdtype(dtype, np.floating):
+            dtype = np.float64
+
+    dtype = np.dtype(dtype)
+
+    return dtype, np.promote_types(dtype, np.float32)
+
+
+def batch_parallel(fn, arrays, workers, workspace=None):
+    """
+    Runs fn on contiguous slices of the batch in a thread pool
+
+    NumPy releases the GIL inside ufuncs and matrix products, so the
+    slices run concurrently. Results come back in batch order whatever
+    order the threads finish in, so the output does not depend on
+    scheduling
+
+    Args:
+        fn: function called as fn(*slices, workspace) on each slice
+        arrays: arrays whose first axis is the batch, or None to pass
+                None to every call
+        workers: number of threads, at most the batch size
+        workspace: optional Workspace whose per-worker children are given
+                   to the calls
+
+    Returns:
+        list of the results of fn, in batch order
+    """
+    m = next(A.shape[0] for A in arrays if A is not None)
+    workers = min(workers, m)
+    bounds = np.linspace(0, m, workers + 1).astype(int)
+
+    if workers not in EXECUTORS:
+        EXECUTORS[workers] = ThreadPoolExecutor(max_workers=workers)
+
+    if workspace is not None:
+        workspaces = workspace.workers(workers)
+    else:
+        workspaces = [None] * workers
+
+    futures = [
+        EXECUTORS[workers].submit(
+            fn,
+            *[None if A is None else A[start:end] for A in arrays],
+            workspaces[k]
+        )
+        for k, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+    ]
+
+    return [future.result() for future in futures]
+
+
+def im2col(A, kernel_shape, stride=(1, 1)):
+    """
+    Builds a strided view of every convolution window of A
+
+    Args:
+        A: numpy.ndarray (m, h, w, c), already padded
+        kernel_shape: (kh, kw)
+        stride: (sh, sw)
+
+    Returns:
+        numpy.ndarray (m, h_out, w_out, c, kh, kw) of windows
+    """
+    sh, sw = stride
+    windows = sliding_window_view(A, kernel_shape, axis=(1, 2))
+
+    return windows[:, ::sh, ::sw]
+
+
+def col2im(cols, shape, stride=(1, 1), out=None):
+    """
+    Scatter-adds window gradients back onto the image they came from
+
+    This is the adjoint of im2col: every element of every window is
+    accumulated into the pixel it was read from
+
+    Args:
+        cols: numpy.ndarray (m, h_out, w_out, kh, kw, c) of window
+              gradients
+        shape: (m, h, w, c) shape of the padded image
+        stride: (sh, sw)
+        out: optional zero-filled array of the given shape to accumulate
+             into
+
+    Returns:
+        numpy.ndarray of the given shape
+    """
+    _, h_out, w_out, kh, kw, _ = cols.shape
+    sh, sw = stride
+
+    A = np.zeros(shape, dtype=cols.dtype) if out is None else out
+
+    # One vectorized add per kernel offset instead of one per window
+    for i in range(kh):
+        for j in range(kw):
+            A[:, i:i + sh * h_out:sh, j:j + sw * w_out:sw, :] += (
+                cols[:, :, :, i, j, :]
+            )
+
+    return A
+
+
+def check_groups(c_prev, W, groups):
+    """
+    Validates the kernels of a grouped convolution
+
+    Args:
+        c_prev: number of input channels
+        W: numpy.ndarray (kh, kw, c_prev // groups, c_new)
+        groups: number of channel groups
+
+    Raises:
+        ValueError: if the channels do not split evenly into groups or W
+                    does not match them
+    """
+    if groups < 1 or c_prev % groups or W.shape[3] % groups:
+        raise ValueError('groups must divide c_prev and c_new')
+    if W.shape[2] != c_prev // groups:
+        raise ValueError('W must have c_prev // groups input channels')
+
+
+def conv_gemm(A, W, stride=(1, 1), groups=1):
+    """
+    Convolves A with W, without bias
+
+    Input channel group k only reaches output channels
+    k * c_new // groups to (k + 1) * c_new // groups - 1; groups == c_prev
+    is a depthwise convolution
+
+    Args:
+        A: numpy.ndarray (m, h, w, c_prev), already padded
+        W: numpy.ndarray (kh, kw, c_prev // groups, c_new)
+        stride: (sh, sw)
+        groups: number of channel groups
+
+    Returns:
+        numpy.ndarray (m, h_out, w_out, c_new)
+    """
+    kh, kw, cg, c_new = W.shape
+    sh, sw = stride
+    m = A.shape[0]
+    h_out = (A.shape[1] - kh) // sh + 1
+    w_out = (A.shape[2] - kw) // sw + 1
+
+    if kh == kw == 1 and groups == 1:
+        # Pointwise: a plain GEMM over every pixel
+        X = A[:, ::sh, ::sw]
+        return (X.reshape(-1, cg) @ W[0, 0]).reshape(m, h_out, w_out, c_new)
+
+    if groups == 1:
+        # (m, h_out, w_out, c_prev, kh, kw) view of the input windows
+        windows = im2col(A, (kh, kw), stride)
+        return np.tensordot(windows, W, axes=([3, 4, 5], [2, 0, 1]))
+
+    Wg = W.reshape(kh, kw, cg, groups, c_new // groups)
+
+    if cg == 1:
+        # Depthwise: one broadcast multiply-add per kernel offset
+        Z = np.zeros((m, h_out, w_out, groups, c_new // groups),
+                     dtype=np.result_type(A, W))
+        for i in range(kh):
+            for j in range(kw):
+                X = A[:, i:i + sh * h_out:sh, j:j + sw * w_out:sw]
+                Z += X[..., np.newaxis] * Wg[i, j, 0]
+        return Z.reshape(m, h_out, w_out, c_new)
+
+    windows = im2col(A, (kh, kw), stride)
+    windows = windows.reshape(m, h_out, w_out, groups, cg, kh, kw)
+    Z = np.einsum('mhwgcij,ijcgn->mhwgn', windows, Wg, optimize=True)
+
+    return Z.reshape(m, h_out, w_out, c_new)
+
+
+def conv_gemm_backward(dZ, A, W, stride=(1, 1), groups=1, out=None):
+    """
+    Gradients of conv_gemm with respect to its input and kernels
+
+    Args:
+        dZ: numpy.ndarray (m, h_out, w_out, c_new)
+        A: numpy.ndarray (m, h, w, c_prev), already padded
+        W: numpy.ndarray (kh, kw, c_prev // groups, c_new)
+        stride: (sh, sw)
+        groups: number of channel groups
+        out: optional zero-filled array shaped like A to accumulate the
+             input gradient into
+
+    Returns:
+        dA: numpy.ndarray shaped like A
+        dW: numpy.ndarray shaped like W
+    """
+    kh, kw, cg, c_new = W.shape
+    m, h_out, w_out, _ = dZ.shape
+    sh, sw = stride
+
+    dA = np.zeros(A.shape, dtype=dZ.dtype) if out is None else out
+
+    if kh == kw == 1 and groups == 1:
+        X = A[:, ::sh, ::sw].reshape(-1, cg)
+        dZ_flat = dZ.reshape(-1, c_new)
+        dA[:, ::sh, ::sw] = (dZ_flat @ W[0, 0].T).reshape(
+            m, h_out, w_out, cg
+        )
+        return dA, (X.T @ dZ_flat).reshape(W.shape)
+
+    if groups == 1:
+        # (m, h_out, w_out, c_prev, kh, kw) view of the input windows
+        windows = im2col(A, (kh, kw), stride)
+
+        # dW: one GEMM of the windows with dZ over (m, h_out, w_out)
+        dW = np.tensordot(windows, dZ, axes=([0, 1, 2], [0, 1, 2]))
+        dW = dW.transpose(1, 2, 0, 3)
+
+        # dA: one GEMM of dZ with the kernels, then col2im scatter-add
+        cols = np.tensordot(dZ, W, axes=([3], [3]))
+        return col2im(cols, A.shape, stride, dA), dW
+
+    Wg = W.reshape(kh, kw, cg, groups, c_new // groups)
+    dZg = dZ.reshape(m, h_out, w_out, groups, c_new // groups)
+
+    if cg == 1:
+        dW = np.empty_like(Wg)
+        for i in range(kh):
+            for j in range(kw):
+                rows = slice(i, i + sh * h_out, sh)
+                cols = slice(j, j + sw * w_out, sw)
+                X = A[:, rows, cols]
+                dW[i, j, 0] = np.einsum('mhwg,mhwgn->gn', X, dZg)
+                dA[:, rows, cols] += np.einsum('mhwgn,gn->mhwg', dZg,
+                                               Wg[i, j, 0])
+        return dA, dW.reshape(W.shape)
+
+    windows = im2col(A, (kh, kw), stride)
+    windows = windows.reshape(m, h_out, w_out, groups, cg, kh, kw)
+
+    dW = np.einsum('mhwgcij,mhwgn->ijcgn', windows, dZg, optimize=True)
+    cols = np.einsum('mhwgn,ijcgn->mhwijgc', dZg, Wg, optimize=True)
+    cols = cols.reshape(m, h_out, w_out, kh, kw, groups * cg)
+
+    return col2im(cols, A.shape, stride, dA), dW.reshape(W.shape)
+
+
+def pool_windows(A, kernel_shape, stride):
+    """
+    Builds a strided view of every pooling window of A
+
+    Non-overlapping windows (stride equal to the kernel) are obtained by
+    reshaping A directly, overlapping ones with sliding_window_view;
+    no data is copied either way
+
+    Args:
+        A: numpy.ndarray (m, h, w, c)
+        kernel_shape: (kh, kw)
+        stride: (sh, sw)
+
+    Returns:
+        numpy.ndarray (m, h_out, w_out, c, kh, kw) of windows
+    """
+    m, h, w, c = A.shape
+    kh, kw = kernel_shape
+    sh, sw = stride
+
+    if (sh, sw) == (kh, kw):
+        h_out = h // kh
+        w_out = w // kw
+        blocks = A[:, :h_out * kh, :w_out * kw].reshape(
+            m, h_out, kh, w_out, kw, c
+        )
+        return blocks.transpose(0, 1, 3, 5, 2, 4)
+
+    windows = sliding_window_view(A, (kh, kw), axis=(1, 2))
+
+    return windows[:, ::sh, ::sw]
+
+
+def max_pool_argmax(windows):
+    """
+    Max pooling that also locates the maximum of every window
+
+    Args:
+        windows: numpy.ndarray (m, h_out, w_out, c, kh, kw) of windows
+
+    Returns:
+        output: numpy.ndarray (m, h_out, w_out, c) of window maxima
+        argmax: numpy.ndarray (m, h_out, w_out, c) of the flat index
+                (row * kw + col) of the maximum inside each window
+    """
+    kh, kw = windows.shape[-2:]
+    flat = windows.reshape(windows.shape[:4] + (kh * kw,))
+
+    argmax = np.argmax(flat, axis=-1)
+    output = np.take_along_axis(flat, argmax[..., np.newaxis], axis=-1)
+
+    return output[..., 0], argmax
+
+
+def pool_scatter(cols, shape, stride, out=None):
+    """
+    Accumulates pooling window gradients back onto the pooled input
+
+    Non-overlapping windows are written back with a single reshape,
+    overlapping ones are accumulated with col2im
+
+    Args:
+        cols: numpy.ndarray (m, h_out, w_out, c, kh, kw) of window
+              gradients
+        shape: (m, h, w, c) shape of the pooled input
+        stride: (sh, sw)
+        out: optional zero-filled array of the given shape to write into
+
+    Returns:
+        numpy.ndarray of the given shape
+    """
+    m, h_out, w_out, c, kh, kw = cols.shape
+    sh, sw = stride
+
+    if (sh, sw) == (kh, kw):
+        A = np.zeros(shape, dtype=cols.dtype) if out is None else out
+        A[:, :h_out * kh, :w_out * kw] = cols.transpose(
+            0, 1, 4, 2, 5, 3
+        ).reshape(m, h_out * kh, w_out * kw, c)
+        return A
+
+    return col2im(cols.transpose(0, 1, 2, 4, 5, 3), shape, stride, out)
+
+
+def argmax_scatter(dA, argmax, shape, kernel_shape, stride, out=None):
+    """
+    Routes max pooling gradients to the input positions of the maxima
+
+    Args:
+        dA: numpy.ndarray (m, h_out, w_out, c) of output gradients
+        argmax: numpy.ndarray (m, h_out, w_out, c) of flat window indices
+                as returned by max_pool_argmax
+        shape: (m, h, w, c) shape of the pooled input
+        kernel_shape: (kh, kw)
+        stride: (sh, sw)
+        out: optional zero-filled array of the given shape to write into
+
+    Returns:
+        numpy.ndarray of the given shape
+    """
+    m, h_out, w_out, c = dA.shape
+    kh, kw = kernel_shape
+    sh, sw = stride
+
+    rows = np.arange(h_out)[:, np.newaxis, np.newaxis] * sh + argmax // kw
+    cols = np.arange(w_out)[:, np.newaxis] * sw + argmax % kw
+    index = (
+        np.arange(m)[:, np.newaxis, np.newaxis, np.newaxis],
+        rows,
+        cols,
+        np.arange(c)
+    )
+
+    A = np.zeros(shape, dtype=dA.dtype) if out is None else out
+
+    if sh >= kh and sw >= kw:
+        # Windows do not overlap, so no position is hit twice
+        A[index] = dA
+    else:
+        np.add.at(A, index, dA)
+
+    return A
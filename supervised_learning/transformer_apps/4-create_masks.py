@@ -3,6 +3,39 @@
 
 import tensorflow as tf
 
+# Look-ahead masks shared by every call, keyed by sequence length
+LOOK_AHEAD_MASKS = {}
+
+
+def look_ahead_mask(seq_len):
+    """
+    Creates the look-ahead mask of a target sequence.
+
+    Masks of a known length are built once and reused by later calls.
+
+    Args:
+        seq_len: Length of the target sequence, an int or a scalar tensor.
+
+    Returns:
+        Tensor of shape (seq_len, seq_len), 1 above the diagonal.
+    """
+    if not isinstance(seq_len, int) or not tf.executing_eagerly():
+        # Graph tensors cannot outlive their graph, so build it there
+        return 1 - tf.linalg.band_part(
+            tf.ones((seq_len, seq_len)),
+            -1,
+            0
+        )
+
+    if seq_len not in LOOK_AHEAD_MASKS:
+        LOOK_AHEAD_MASKS[seq_len] = 1 - tf.linalg.band_part(
+            tf.ones((seq_len, seq_len)),
+            -1,
+            0
+        )
+
+    return LOOK_AHEAD_MASKS[seq_len]
+
 
 def create_masks(inputs, target):
     """
@@ -15,7 +48,8 @@ def create_masks(inputs, target):
     Returns:
         encoder_mask: Padding mask for the encoder.
         combined_mask: Padding and look-ahead mask for decoder self-attention.
-        decoder_mask: Padding mask for decoder cross-attention.
+        decoder_mask: Padding mask for decoder cross-attention, the same
+            tensor as encoder_mask.
     """
     encoder_mask = tf.cast(
         tf.math.equal(inputs, 0),
@@ -23,11 +57,8 @@ def create_masks(inputs, target):
     )
     encoder_mask = encoder_mask[:, tf.newaxis, tf.newaxis, :]
 
-    decoder_mask = tf.cast(
-        tf.math.equal(inputs, 0),
-        tf.float32
-    )
-    decoder_mask = decoder_mask[:, tf.newaxis, tf.newaxis, :]
+    # Cross-attention masks the same source padding
+    decoder_mask = encoder_mask
 
     target_padding_mask = tf.cast(
         tf.math.equal(target, 0),
@@ -35,17 +66,13 @@ def create_masks(inputs, target):
     )
     target_padding_mask = target_padding_mask[:, tf.newaxis, tf.newaxis, :]
 
-    seq_len = tf.shape(target)[1]
-
-    look_ahead_mask = 1 - tf.linalg.band_part(
-        tf.ones((seq_len, seq_len)),
-        -1,
-        0
-    )
+    seq_len = target.shape[1]
+    if seq_len is None:
+        seq_len = tf.shape(target)[1]
 
     combined_mask = tf.maximum(
         target_padding_mask,
-        look_ahead_mask
+        look_ahead_mask(seq_len)
     )
 
     return encoder_mask, combined_mask, decoder_mask
@@ -39,9 +39,9 @@ class PositionalEncoding(tf.keras.layers.Layer):
 
         self.pos_encoding = pe[tf.newaxis, :, :]
 
-    def call(self, x):
-        """Add positional encoding to input."""
-        return x + self.pos_encoding[:, :tf.shape(x)[1], :]
+    def call(self, x, offset=0):
+        """Add positional encoding to input, starting at offset."""
+        return x + self.pos_encoding[:, offset:offset + tf.shape(x)[1], :]
 
 
 class MultiHeadAttention(tf.keras.layers.Layer):
@@ -60,27 +60,36 @@ class MultiHeadAttention(tf.keras.layers.Layer):
         self.wv = tf.keras.layers.Dense(dm)
         self.wo = tf.keras.layers.Dense(dm)
 
-    def call(self, q, k, v, mask=None):
-        """Perform multi-head attention."""
+    def split_heads(self, x, batch_size):
+        """Split the last dimension into (h, depth) heads."""
+        x = tf.reshape(
+            x, (batch_size, -1, self.h, self.depth)
+        )
+        return tf.transpose(x, [0, 2, 1, 3])
+
+    def call(self, q, k, v, mask=None, cache=None, static_kv=False):
+        """
+        Perform multi-head attention.
+
+        With a cache dict, empty on the first call, the projected keys
+        and values of earlier calls are reused for incremental decoding:
+        new ones are appended to them, or, with static_kv, k and v are
+        projected on the first call only. The cache is not modified; the
+        updated one is returned along with the output.
+        """
         batch_size = tf.shape(q)[0]
 
-        q = self.wq(q)
-        k = self.wk(k)
-        v = self.wv(v)
+        q = self.split_heads(self.wq(q), batch_size)
 
-        q = tf.reshape(
-            q, (batch_size, -1, self.h, self.depth)
-        )
-        k = tf.reshape(
-            k, (batch_size, -1, self.h, self.depth)
-        )
-        v = tf.reshape(
-            v, (batch_size, -1, self.h, self.depth)
-        )
+        if cache is not None and static_kv and 'k' in cache:
+            k, v = cache['k'], cache['v']
+        else:
+            k = self.split_heads(self.wk(k), batch_size)
+            v = self.split_heads(self.wv(v), batch_size)
 
-        q = tf.transpose(q, [0, 2, 1, 3])
-        k = tf.transpose(k, [0, 2, 1, 3])
-        v = tf.transpose(v, [0, 2, 1, 3])
+            if cache is not None and 'k' in cache:
+                k = tf.concat([cache['k'], k], axis=2)
+                v = tf.concat([cache['v'], v], axis=2)
 
         scores = tf.matmul(q, k, transpose_b=True)
         scores /= tf.math.sqrt(tf.cast(self.depth, tf.float32))
@@ -95,6 +104,9 @@ class MultiHeadAttention(tf.keras.layers.Layer):
 
         output = tf.reshape(output, (batch_size, -1, self.dm))
 
+        if cache is not None:
+            return self.wo(output), {'k': k, 'v': v}
+
         return self.wo(output)
 
 
@@ -154,20 +166,40 @@ class DecoderBlock(tf.keras.layers.Layer):
         )
 
     def call(self, x, encoder_output, target_mask=None,
-             encoder_mask=None):
-        """Run the decoder block."""
-        attention1 = self.mha1(
-            x, x, x, target_mask
-        )
+             encoder_mask=None, cache=None):
+        """
+        Run the decoder block.
+
+        With a cache, the block runs incrementally and also returns the
+        updated cache.
+        """
+        if cache is None:
+            attention1 = self.mha1(x, x, x, target_mask)
+        else:
+            attention1, self_cache = self.mha1.call(
+                x, x, x, target_mask, cache=cache['self']
+            )
         x = self.norm1(x + attention1)
 
-        attention2 = self.mha2(
-            x, encoder_output, encoder_output, encoder_mask
-        )
+        if cache is None:
+            attention2 = self.mha2(
+                x, encoder_output, encoder_output, encoder_mask
+            )
+        else:
+            attention2, cross_cache = self.mha2.call(
+                x, encoder_output, encoder_output, encoder_mask,
+                cache=cache['cross'],
+                static_kv=True
+            )
         x = self.norm2(x + attention2)
 
         ffn = self.ffn(x)
-        return self.norm3(x + ffn)
+        x = self.norm3(x + ffn)
+
+        if cache is not None:
+            return x, {'self': self_cache, 'cross': cross_cache}
+
+        return x
 
 
 class Encoder(tf.keras.layers.Layer):
@@ -222,22 +254,56 @@ class Decoder(tf.keras.layers.Layer):
             for _ in range(N)
         ]
 
+    def init_cache(self):
+        """Create an empty cache for incremental decoding."""
+        return {
+            'length': 0,
+            'blocks': [
+                {'self': {}, 'cross': {}}
+                for _ in self.blocks
+            ]
+        }
+
     def call(self, x, encoder_output, target_mask=None,
-             encoder_mask=None):
-        """Run the decoder."""
+             encoder_mask=None, cache=None):
+        """
+        Run the decoder.
+
+        With a cache from init_cache or from the previous call, x only
+        holds the positions that follow those already decoded, and the
+        updated cache is returned along with the output.
+        """
+        offset = 0 if cache is None else cache['length']
+
         x = self.embedding(x)
         x *= tf.math.sqrt(tf.cast(self.dm, tf.float32))
-        x = self.positional_encoding(x)
-
-        for block in self.blocks:
-            x = block(
+        x = self.positional_encoding(x, offset=offset)
+
+        if cache is None:
+            for block in self.blocks:
+                x = block(
+                    x,
+                    encoder_output,
+                    target_mask,
+                    encoder_mask
+                )
+
+            return x
+
+        # Caches mix tensors and ints, which Layer.__call__ may reject or
+        # copy, so the cached path calls the blocks directly
+        blocks = []
+        for block, block_cache in zip(self.blocks, cache['blocks']):
+            x, block_cache = block.call(
                 x,
                 encoder_output,
                 target_mask,
-                encoder_mask
+                encoder_mask,
+                cache=block_cache
             )
+            blocks.append(block_cache)
 
-        return x
+        return x, {'length': offset + x.shape[1], 'blocks': blocks}
 
 
 class Transformer(tf.keras.Model):
@@ -272,3 +338,37 @@ class Transformer(tf.keras.Model):
         )
 
         return self.linear(decoder_output)
+
+    def encode(self, inputs, encoder_mask=None):
+        """Run the encoder once for a batch of sources."""
+        return self.encoder(inputs, encoder_mask)
+
+    def init_cache(self):
+        """Create an empty cache for decode_step."""
+        return self.decoder.init_cache()
+
+    def decode_step(self, target, encoder_output, decoder_mask=None,
+                    cache=None):
+        """
+        Decode the next target token of every row.
+
+        Args:
+            target: Tensor of shape (batch, 1) containing the newest token
+                of every row.
+            encoder_output: Output of encode for the same sources.
+            decoder_mask: Padding mask of the sources.
+            cache: dict from init_cache or from the previous decode_step.
+
+        Returns:
+            Tensor of shape (batch, 1, target_vocab) of logits, and the
+            cache to pass to the next decode_step.
+        """
+        decoder_output, cache = self.decoder.call(
+            target,
+            encoder_output,
+            None,
+            decoder_mask,
+            cache=cache
+        )
+
+        return self.linear(decoder_output), cache
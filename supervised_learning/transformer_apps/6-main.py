@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import tensorflow as tf
+
+create_masks = __import__('4-create_masks').create_masks
+Transformer = __import__('5-transformer').Transformer
+
+tf.random.set_seed(0)
+transformer = Transformer(2, 32, 4, 64, 20, 20, 32)
+
+inputs = tf.constant([[18, 3, 4, 5, 19, 0], [18, 7, 8, 19, 0, 0]])
+target = tf.constant([[18, 5, 6, 7, 8, 9], [18, 3, 2, 19, 0, 0]])
+encoder_mask, combined_mask, decoder_mask = create_masks(inputs, target)
+
+full = transformer(inputs, target, encoder_mask=encoder_mask,
+                   combined_mask=combined_mask, decoder_mask=decoder_mask)
+
+# One token at a time from the cache
+encoder_output = transformer.encode(inputs, encoder_mask=encoder_mask)
+cache = transformer.init_cache()
+steps = []
+for i in range(target.shape[1]):
+    logits, cache = transformer.decode_step(
+        target[:, i:i + 1], encoder_output, decoder_mask=decoder_mask,
+        cache=cache
+    )
+    steps.append(logits)
+
+# Padded target positions are only checked where the full pass sees them
+incremental = tf.concat(steps, axis=1)
+print(cache['length'])
+print(np.allclose(full[0], incremental[0], atol=1e-5))
+print(np.allclose(full[1, :4], incremental[1, :4], atol=1e-5))
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Translate Portuguese sentences to English with a trained Transformer."""
+
+import numpy as np
+import tensorflow as tf
+
+
+def padding_mask(inputs):
+    """
+    Create the padding mask of a batch of token ids.
+
+    Args:
+        inputs: Tensor of shape (batch_size, seq_len).
+
+    Returns:
+        Tensor of shape (batch_size, 1, 1, seq_len), 1 at padding.
+    """
+    mask = tf.cast(tf.math.equal(inputs, 0), tf.float32)
+
+    return mask[:, tf.newaxis, tf.newaxis, :]
+
+
+def gather_rows(structure, rows):
+    """
+    Select rows of every tensor of a nested structure.
+
+    Args:
+        structure: Tensor, or dict/list of them such as a decoding cache;
+            other values are kept as they are.
+        rows: Indices along the batch axis.
+
+    Returns:
+        The structure with every tensor gathered along its first axis.
+    """
+    return tf.nest.map_structure(
+        lambda x: tf.gather(x, rows) if tf.is_tensor(x) else x,
+        structure
+    )
+
+
+def length_penalty(length, alpha):
+    """
+    GNMT length normalization term ((5 + length) / 6) ** alpha.
+
+    Args:
+        length: Number of generated tokens.
+        alpha: Strength of the normalization, 0 to disable it.
+
+    Returns:
+        The term the summed log-probability is divided by.
+    """
+    return ((5 + length) / 6) ** alpha
+
+
+def check_lengths(transformer, inputs, max_len):
+    """
+    Fit a decoding request to the positional tables of a Transformer.
+
+    Args:
+        transformer: Transformer used for decoding.
+        inputs: Tensor of shape (batch_size, seq_len) of source tokens.
+        max_len: Requested maximum number of generated tokens.
+
+    Returns:
+        max_len, capped at the number of target positions of the model.
+
+    Raises:
+        ValueError: If the sources are longer than the model allows.
+    """
+    source_len = transformer.encoder.positional_encoding.pos_encoding.shape[1]
+    target_len = transformer.decoder.positional_encoding.pos_encoding.shape[1]
+
+    if inputs.shape[1] > source_len:
+        raise ValueError(
+            'sources of {} tokens exceed the {} positions of the '
+            'model'.format(inputs.shape[1], source_len)
+        )
+
+    return min(max_len, target_len)
+
+
+def greedy_decode(transformer, inputs, start, end, max_len):
+    """
+    Decode a batch of sources greedily.
+
+    The encoder runs once and the decoder processes one token per step
+    from its cache. Rows that emit the end token are removed from the
+    batch, together with their cache and encoder output.
+
+    Args:
+        transformer: Trained Transformer.
+        inputs: Tensor of shape (batch_size, seq_len) of source tokens.
+        start: Start token of the target language.
+        end: End token of the target language.
+        max_len: Maximum number of generated tokens, capped at the
+            number of target positions of the model.
+
+    Returns:
+        List of the generated token lists, without start and end tokens.
+
+    Raises:
+        ValueError: If the sources are longer than the model allows.
+    """
+    max_len = check_lengths(transformer, inputs, max_len)
+    mask = padding_mask(inputs)
+    encoder_output = transformer.encode(inputs, mask)
+    cache = transformer.init_cache()
+
+    outputs = [[] for _ in range(inputs.shape[0])]
+    active = np.arange(inputs.shape[0])
+    tokens = np.full((len(active), 1), start)
+
+    for _ in range(max_len):
+        logits, cache = transformer.decode_step(
+            tf.constant(tokens), encoder_output, mask, cache
+        )
+        next_tokens = np.argmax(logits[:, -1].numpy(), axis=-1)
+
+        running = next_tokens != end
+        for row, token in zip(active[running], next_tokens[running]):
+            outputs[row].append(int(token))
+
+        if not running.any():
+            break
+
+        if not running.all():
+            # Drop finished rows from the batch
+            rows = np.flatnonzero(running)
+            active = active[rows]
+            encoder_output, mask, cache = gather_rows(
+                (encoder_output, mask, cache), rows
+            )
+
+        tokens = next_tokens[running][:, np.newaxis]
+
+    return outputs
+
+
+def beam_search(transformer, inputs, start, end, max_len, beam_size=4,
+                alpha=0.6):
+    """
+    Decode a batch of sources with beam search.
+
+    Every source keeps beam_size hypotheses in one flat batch. A
+    hypothesis ending with the end token, or reaching max_len, is scored
+    by its log-probability divided by length_penalty. A source stops
+    early once no running hypothesis can beat its best finished one, and
+    is then removed from the batch.
+
+    Args:
+        transformer: Trained Transformer.
+        inputs: Tensor of shape (batch_size, seq_len) of source tokens.
+        start: Start token of the target language.
+        end: End token of the target language.
+        max_len: Maximum number of generated tokens, capped at the
+            number of target positions of the model.
+        beam_size: Number of hypotheses kept per source.
+        alpha: Length normalization strength.
+
+    Returns:
+        List of the best token lists, without start and end tokens.
+
+    Raises:
+        ValueError: If the sources are longer than the model allows.
+    """
+    max_len = check_lengths(transformer, inputs, max_len)
+    k = beam_size
+    m = inputs.shape[0]
+
+    mask = padding_mask(inputs)
+    encoder_output = transformer.encode(inputs, mask)
+    encoder_output = tf.repeat(encoder_output, k, axis=0)
+    mask = tf.repeat(mask, k, axis=0)
+    cache = transformer.init_cache()
+
+    sources = np.arange(m)
+    scores = np.full((m, k), -np.inf)
+    scores[:, 0] = 0
+    hypotheses = np.zeros((m, k, 0), dtype=int)
+    finished = [[] for _ in range(m)]
+    tokens = np.full((m * k, 1), start)
+
+    for step in range(max_len):
+        length = step + 1
+        logits, cache = transformer.decode_step(
+            tf.constant(tokens), encoder_output, mask, cache
+        )
+        log_probs = tf.nn.log_softmax(logits[:, -1]).numpy()
+        vocab = log_probs.shape[-1]
+
+        # Best 2k continuations of each source, so that k survive even if
+        # up to k of them end here
+        candidates = (scores[:, :, np.newaxis]
+                      + log_probs.reshape(len(sources), k, vocab))
+        candidates = candidates.reshape(len(sources), k * vocab)
+        top = np.argpartition(-candidates, 2 * k - 1, axis=1)[:, :2 * k]
+        top_scores = np.take_along_axis(candidates, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        scores = np.full((len(sources), k), -np.inf)
+        parents = np.zeros((len(sources), k), dtype=int)
+        next_tokens = np.zeros((len(sources), k), dtype=int)
+        keep = np.zeros(len(sources), dtype=bool)
+
+        for g, source in enumerate(sources):
+            alive = 0
+
+            for rank, (score, index) in enumerate(zip(top_scores[g], top[g])):
+                if score == -np.inf or alive == k:
+                    break
+
+                beam, token = divmod(int(index), vocab)
+                tokens_so_far = hypotheses[g, beam].tolist()
+
+                if token == end:
+                    if rank < k:
+                        finished[source].append(
+                            (score / length_penalty(length, alpha),
+                             tokens_so_far)
+                        )
+                elif length == max_len:
+                    finished[source].append(
+                        (score / length_penalty(length, alpha),
+                         tokens_so_far + [token])
+                    )
+                    alive += 1
+                else:
+                    scores[g, alive] = score
+                    parents[g, alive] = beam
+                    next_tokens[g, alive] = token
+                    alive += 1
+
+            # Log-probabilities only decrease, so a running hypothesis
+            # scores at most its current sum over the largest penalty
+            best = max((f[0] for f in finished[source]), default=-np.inf)
+            bound = scores[g, 0] / length_penalty(max_len, alpha)
+            keep[g] = length < max_len and bound > best
+
+        if not keep.any():
+            break
+
+        # Reorder the flat batch by parent hypothesis, dropping sources
+        # that are done
+        groups = np.flatnonzero(keep)
+        rows = (groups[:, np.newaxis] * k + parents[groups]).reshape(-1)
+        encoder_output, mask, cache = gather_rows(
+            (encoder_output, mask, cache), rows
+        )
+
+        hypotheses = np.concatenate(
+            (np.take_along_axis(hypotheses[groups],
+                                parents[groups][:, :, np.newaxis], axis=1),
+             next_tokens[groups][:, :, np.newaxis]),
+            axis=2
+        )
+        sources = sources[groups]
+        scores = scores[groups]
+        tokens = next_tokens[groups].reshape(-1, 1)
+
+    return [max(f, key=lambda h: h[0])[1] for f in finished]
+
+
+def translate(transformer, data, sentences, max_len=100, beam_size=1,
+              alpha=0.6, batch_size=64):
+    """
+    Translate Portuguese sentences to English.
+
+    Args:
+        transformer: Transformer trained on data, e.g. by train_transformer.
+        data: Dataset whose tokenizers the transformer was trained with.
+        sentences: List of Portuguese sentences.
+        max_len: Maximum number of tokens per translation, capped at the
+            number of target positions of the model.
+        beam_size: Number of beams; 1 decodes greedily.
+        alpha: Length normalization strength of beam search.
+        batch_size: Number of sentences decoded together.
+
+    Returns:
+        List of the English translations.
+
+    Raises:
+        ValueError: If a sentence has more tokens than the model allows.
+    """
+    pt_start = data.tokenizer_pt.vocab_size
+    en_start = data.tokenizer_en.vocab_size
+
+    encoded = [
+        [pt_start]
+        + data.tokenizer_pt.encode(sentence, add_special_tokens=False)
+        + [pt_start + 1]
+        for sentence in sentences
+    ]
+
+    source_len = transformer.encoder.positional_encoding.pos_encoding.shape[1]
+    for sentence, tokens in zip(sentences, encoded):
+        if len(tokens) > source_len:
+            raise ValueError(
+                '{!r} has {} tokens, more than the {} positions of the '
+                'model'.format(sentence, len(tokens), source_len)
+            )
+
+    # Sources of similar lengths share a batch, which limits padding
+    order = np.argsort([len(tokens) for tokens in encoded], kind='stable')
+    translations = [None] * len(sentences)
+
+    for first in range(0, len(order), batch_size):
+        indices = order[first:first + batch_size]
+        inputs = np.zeros((len(indices), len(encoded[indices[-1]])),
+                          dtype=np.int64)
+        for row, i in enumerate(indices):
+            inputs[row, :len(encoded[i])] = encoded[i]
+        inputs = tf.constant(inputs)
+
+        if beam_size > 1:
+            outputs = beam_search(transformer, inputs, en_start,
+                                  en_start + 1, max_len, beam_size, alpha)
+        else:
+            outputs = greedy_decode(transformer, inputs, en_start,
+                                    en_start + 1, max_len)
+
+        for i, tokens in zip(indices, outputs):
+            # Ids past the tokenizer vocabulary are start/end markers
+            translations[i] = data.tokenizer_en.decode(
+                [t for t in tokens if t < en_start],
+                skip_special_tokens=True
+            )
+
+    return translations
@@ -3,11 +3,12 @@
 Gaussian Process update module
 """
 import numpy as np
+from scipy.linalg import cho_solve, solve_triangular
 
 
 class GaussianProcess:
     """
-    Represents a noiseless 1D Gaussian process
+    Represents a noiseless Gaussian process
     """
 
     def __init__(self, X_init, Y_init, l=1, sigma_f=1):
@@ -15,9 +16,11 @@ class GaussianProcess:
         Class constructor for GaussianProcess
 
         Parameters:
-            X_init: numpy.ndarray of shape (t, 1) - sampled inputs
+            X_init: numpy.ndarray of shape (t, d) - sampled inputs
             Y_init: numpy.ndarray of shape (t, 1) - sampled outputs
-            l: length scale parameter for the kernel
+            l: length scale parameter for the kernel, either a scalar or
+               a numpy.ndarray of shape (d,) with one length scale per
+               input dimension (ARD)
             sigma_f: standard deviation multiplier for kernel output
         """
         self.X = X_init
@@ -25,6 +28,7 @@ class GaussianProcess:
         self.l = l
         self.sigma_f = sigma_f
         self.K = self.kernel(X_init, X_init)
+        self.L = np.linalg.cholesky(self.K)
 
     def kernel(self, X1, X2):
         """
@@ -32,22 +36,40 @@ class GaussianProcess:
         using the Radial Basis Function (RBF) kernel
 
         Parameters:
-            X1: numpy.ndarray of shape (m, 1)
-            X2: numpy.ndarray of shape (n, 1)
+            X1: numpy.ndarray of shape (m, d)
+            X2: numpy.ndarray of shape (n, d)
 
         Returns:
             Covariance kernel matrix as a numpy.ndarray of shape (m, n)
         """
-        sqdist = (X1 - X2.T) ** 2
-        return (self.sigma_f ** 2) * np.exp(-0.5 * sqdist / (self.l ** 2))
+        sqdist = (X1[:, np.newaxis, :] - X2[np.newaxis, :, :]) ** 2
+        sqdist = np.sum(sqdist / (np.asarray(self.l) ** 2), axis=2)
+        return (self.sigma_f ** 2) * np.exp(-0.5 * sqdist)
 
-    def predict(self, X_s):
+    def kernel_diag(self, X):
+        """
+        Calculates the diagonal of the covariance kernel matrix of X
+        with itself without building the full matrix
+
+        Parameters:
+            X: numpy.ndarray of shape (m, d)
+
+        Returns:
+            Kernel diagonal as a numpy.ndarray of shape (m,)
+        """
+        return np.full(X.shape[0], self.sigma_f ** 2, dtype=float)
+
+    def predict(self, X_s, chunk_size=4096):
         """
         Predicts the mean and variance of points in a Gaussian process
 
+        Only the diagonal of the posterior covariance is computed, in
+        chunks of X_s, so memory stays O(chunk_size * t)
+
         Parameters:
-            X_s: numpy.ndarray of shape (s, 1) containing all points
+            X_s: numpy.ndarray of shape (s, d) containing all points
                  whose mean and variance should be calculated
+            chunk_size: maximum number of points of X_s evaluated at once
 
         Returns:
             mu: numpy.ndarray of shape (s,) containing the mean for
@@ -55,26 +77,110 @@ class GaussianProcess:
             sigma: numpy.ndarray of shape (s,) containing the variance for
                    each point in X_s
         """
+        s = X_s.shape[0]
+        mu = np.empty(s)
+        sigma = np.empty(s)
+
+        # K^-1 Y through the cached Cholesky factor K = L L^T
+        alpha = cho_solve((self.L, True), self.Y)
+
+        for start in range(0, s, chunk_size):
+            X_c = X_s[start:start + chunk_size]
+            K_s = self.kernel(self.X, X_c)
+            v = solve_triangular(self.L, K_s, lower=True)
+
+            end = start + X_c.shape[0]
+            mu[start:end] = (K_s.T @ alpha).reshape(-1)
+            sigma[start:end] = self.kernel_diag(X_c) - np.sum(v ** 2, axis=0)
+
+        return mu, sigma
+
+    def predict_cov(self, X_s):
+        """
+        Predicts the mean and full posterior covariance of points in a
+        Gaussian process
+
+        Parameters:
+            X_s: numpy.ndarray of shape (s, d) containing all points
+                 whose mean and covariance should be calculated
+
+        Returns:
+            mu: numpy.ndarray of shape (s,) containing the mean for
+                each point in X_s
+            cov: numpy.ndarray of shape (s, s) containing the posterior
+                 covariance between the points in X_s
+        """
         K_s = self.kernel(self.X, X_s)
         K_ss = self.kernel(X_s, X_s)
-        K_inv = np.linalg.inv(self.K)
 
-        mu = K_s.T @ K_inv @ self.Y
-        mu = mu.reshape(-1)
+        alpha = cho_solve((self.L, True), self.Y)
+        v = solve_triangular(self.L, K_s, lower=True)
 
-        sigma_cov = K_ss - K_s.T @ K_inv @ K_s
-        sigma = np.diag(sigma_cov)
+        mu = (K_s.T @ alpha).reshape(-1)
+        cov = K_ss - v.T @ v
 
-        return mu, sigma
+        return mu, cov
+
+    def predict_grad(self, X_s):
+        """
+        Predicts the mean and variance of points in a Gaussian process
+        together with their gradients with respect to the points
+
+        Parameters:
+            X_s: numpy.ndarray of shape (s, d) containing all points
+                 whose mean and variance should be calculated
+
+        Returns:
+            mu: numpy.ndarray of shape (s,) containing the mean for
+                each point in X_s
+            sigma: numpy.ndarray of shape (s,) containing the variance for
+                   each point in X_s
+            dmu: numpy.ndarray of shape (s, d) containing the gradient of
+                 the mean at each point in X_s
+            dsigma: numpy.ndarray of shape (s, d) containing the gradient
+                    of the variance at each point in X_s
+        """
+        K_s = self.kernel(self.X, X_s)
+        alpha = cho_solve((self.L, True), self.Y).reshape(-1)
+        w = cho_solve((self.L, True), K_s)
+
+        mu = K_s.T @ alpha
+        sigma = self.kernel_diag(X_s) - np.sum(K_s * w, axis=0)
+
+        # d k(x_i, x) / d x = k(x_i, x) * (x_i - x) / l^2, shape (t, s, d)
+        diff = self.X[:, np.newaxis, :] - X_s[np.newaxis, :, :]
+        dK_s = K_s[..., np.newaxis] * diff / (np.asarray(self.l) ** 2)
+
+        dmu = np.einsum('i,ijk->jk', alpha, dK_s)
+        dsigma = -2 * np.einsum('ij,ijk->jk', w, dK_s)
+
+        return mu, sigma, dmu, dsigma
 
     def update(self, X_new, Y_new):
         """
         Updates a Gaussian Process with a new sample point and value
 
         Parameters:
-            X_new: numpy.ndarray of shape (1,) - new sample point
+            X_new: numpy.ndarray of shape (d,) - new sample point
             Y_new: numpy.ndarray of shape (1,) - new sample function value
         """
-        self.X = np.vstack((self.X, X_new.reshape(-1, 1)))
+        X_new = X_new.reshape(1, -1)
+        k = self.kernel(self.X, X_new)
+        k_nn = self.kernel(X_new, X_new)
+
+        # Rank-one block extension of the Cholesky factor:
+        # [[K, k], [k^T, k_nn]] = [[L, 0], [l^T, d]] [[L, 0], [l^T, d]]^T
+        l_row = solve_triangular(self.L, k, lower=True)
+        d2 = k_nn - l_row.T @ l_row
+        d = np.sqrt(np.maximum(d2, np.finfo(float).eps * k_nn))
+
+        t = self.L.shape[0]
+        L = np.zeros((t + 1, t + 1))
+        L[:t, :t] = self.L
+        L[t:, :t] = l_row.T
+        L[t:, t:] = d
+        self.L = L
+
+        self.K = np.block([[self.K, k], [k.T, k_nn]])
+        self.X = np.vstack((self.X, X_new))
         self.Y = np.vstack((self.Y, Y_new.reshape(-1, 1)))
-        self.K = self.kernel(self.X, self.X)
@@ -1,45 +1,137 @@
 #!/usr/bin/env python3
 """Bayesian Optimization module."""
 
+import copy
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
 import numpy as np
-from scipy.stats import norm
+from scipy.optimize import minimize as sp_minimize
+from scipy.stats import norm, qmc
 
 GP = __import__('2-gp').GaussianProcess
+Study = __import__('study').Study
+
+
+def timed(f, X):
+    """
+    Evaluate f at X and time the evaluation.
+
+    Args:
+        f: black-box function
+        X: point (d,)
+
+    Returns:
+        Y: value of f at X
+        duration: wall-clock time of the evaluation in seconds
+    """
+    start = time.perf_counter()
+    Y = f(X)
+    return Y, time.perf_counter() - start
 
 
 class BayesianOptimization:
     """Bayesian Optimization using Gaussian Processes."""
 
     def __init__(self, f, X_init, Y_init, bounds, ac_samples,
-                 l=1, sigma_f=1, xsi=0.01, minimize=True):
+                 l=1, sigma_f=1, xsi=0.01, minimize=True,
+                 n_restarts=0, seed=None, study=None):
         """
         Initialize Bayesian Optimization.
 
         Args:
             f: black-box function
-            X_init: initial inputs (t, 1)
+            X_init: initial inputs (t, d)
             Y_init: initial outputs (t, 1)
-            bounds: (min, max)
-            ac_samples: number of acquisition points
-            l: kernel length
+            bounds: (min, max) for 1D inputs, or a sequence of d
+                    (min, max) pairs, one per input dimension
+            ac_samples: number of acquisition points; a regular grid in
+                        1D and a Sobol sequence in higher dimensions
+            l: kernel length, scalar or (d,) for one length per dimension
             sigma_f: signal variance
             xsi: exploration factor
             minimize: True for minimization, False for maximization
+            n_restarts: number of L-BFGS-B starts used to refine the best
+                        acquisition point; 0 keeps the best of X_s
+            seed: seed for the Sobol sequence and the random starts
+            study: Study recording every evaluation of f; the points it
+                   already holds are added to the GP so that an
+                   interrupted study resumes where it stopped
         """
         self.f = f
         self.gp = GP(X_init, Y_init, l=l, sigma_f=sigma_f)
+        self.study = study
+
+        X_prev, Y_prev = (study.observations() if study is not None
+                          else (None, None))
+        if X_prev is not None:
+            for X, Y in zip(X_prev, Y_prev):
+                if not self.is_sampled(X):
+                    self.gp.update(X, Y)
+
+        self.bounds = np.atleast_2d(np.asarray(bounds, dtype=float))
+        d = self.bounds.shape[0]
+        low, high = self.bounds[:, 0], self.bounds[:, 1]
+
+        self.rng = np.random.default_rng(seed)
 
-        self.X_s = np.linspace(bounds[0], bounds[1], ac_samples).reshape(-1, 1)
+        if d == 1:
+            self.X_s = np.linspace(low[0], high[0],
+                                   ac_samples).reshape(-1, 1)
+        else:
+            sobol = qmc.Sobol(d, seed=self.rng)
+            points = sobol.random_base2(int(np.ceil(np.log2(ac_samples))))
+            self.X_s = qmc.scale(points[:ac_samples], low, high)
 
         self.xsi = xsi
         self.minimize = minimize
+        self.n_restarts = n_restarts
+
+    def expected_improvement(self, X):
+        """
+        Expected Improvement and its gradient at the points X.
+
+        Args:
+            X: points to evaluate (n, d)
+
+        Returns:
+            EI: (n,)
+            dEI: gradient of EI with respect to X (n, d)
+        """
+        mu, sigma, dmu, dsigma = self.gp.predict_grad(X)
 
-    def acquisition(self):
+        if self.minimize:
+            best = np.min(self.gp.Y)
+            imp = best - mu - self.xsi
+            dimp = -dmu
+        else:
+            best = np.max(self.gp.Y)
+            imp = mu - best - self.xsi
+            dimp = dmu
+
+        dsigma = np.where((sigma > 1e-9)[:, np.newaxis], dsigma, 0)
+        sigma = np.maximum(sigma, 1e-9)
+
+        Z = imp / sigma
+        cdf = norm.cdf(Z)
+        pdf = norm.pdf(Z)
+
+        EI = imp * cdf + sigma * pdf
+        dEI = dimp * cdf[:, np.newaxis] + dsigma * pdf[:, np.newaxis]
+
+        return EI, dEI
+
+    def acquisition(self, exclude=None, tol=1e-3):
         """
         Expected Improvement acquisition function.
 
+        Args:
+            exclude: points (k, d) the next point must not be close to
+            tol: distance below which a point counts as one of exclude,
+                 as a fraction of the range of each dimension
+
         Returns:
-            X_next: (1,)
+            X_next: (d,), or None if every candidate is excluded
             EI: (ac_samples,)
         """
         mu, sigma = self.gp.predict(self.X_s)
@@ -57,10 +149,214 @@ class BayesianOptimization:
 
         EI = imp * norm.cdf(Z) + sigma * norm.pdf(Z)
 
-        X_next = self.X_s[np.argmax(EI)].reshape(1)
+        if exclude is not None:
+            EI = np.where(self.is_near(self.X_s, exclude, tol), -np.inf, EI)
+            if np.all(EI == -np.inf):
+                return None, EI
+
+        X_next = self.X_s[np.argmax(EI)].reshape(-1)
+
+        if self.n_restarts > 0:
+            X_next = self.maximize_acquisition(EI, exclude, tol)
 
         return X_next, EI
 
+    def maximize_acquisition(self, EI, exclude=None, tol=1e-3):
+        """
+        Maximize Expected Improvement with multi-start L-BFGS-B.
+
+        Half of the starts are the best points of X_s, the rest are drawn
+        uniformly at random within the bounds. Optima close to a point of
+        exclude are rejected.
+
+        Args:
+            EI: Expected Improvement at each point of X_s (ac_samples,),
+                -inf at the excluded ones
+            exclude: points (k, d) the result must not be close to
+            tol: distance below which a point counts as one of exclude,
+                 as a fraction of the range of each dimension
+
+        Returns:
+            X_next: (d,)
+        """
+        low, high = self.bounds[:, 0], self.bounds[:, 1]
+        n_grid = min((self.n_restarts + 1) // 2,
+                     int(np.sum(EI > -np.inf)))
+        n_rand = self.n_restarts - n_grid
+
+        starts = np.vstack((
+            self.X_s[np.argsort(EI)[::-1][:n_grid]],
+            self.rng.uniform(low, high, size=(n_rand, len(low)))
+        ))
+
+        def neg_ei(x):
+            """Negative EI and gradient at a single point."""
+            ei, dei = self.expected_improvement(x.reshape(1, -1))
+            return -ei[0], -dei[0]
+
+        X_best = self.X_s[np.argmax(EI)].reshape(-1)
+        EI_best = np.max(EI)
+
+        for x0 in starts:
+            res = sp_minimize(neg_ei, x0, jac=True, method='L-BFGS-B',
+                              bounds=self.bounds)
+            X_res = np.clip(res.x, low, high)
+            if exclude is not None and self.is_near(
+                    X_res.reshape(1, -1), exclude, tol)[0]:
+                continue
+            if -res.fun > EI_best:
+                X_best, EI_best = X_res, -res.fun
+
+        return np.clip(X_best, low, high)
+
+    def is_near(self, X, points, tol):
+        """
+        Check which points of X are close to any of points.
+
+        Args:
+            X: points to check (n, d)
+            points: reference points (k, d)
+            tol: distance below which two points are close, as a
+                 fraction of the range of each dimension
+
+        Returns:
+            boolean array (n,)
+        """
+        scale = tol * (self.bounds[:, 1] - self.bounds[:, 0])
+        points = np.reshape(points, (-1, X.shape[1]))
+        diff = np.abs(X[:, np.newaxis, :] - points[np.newaxis, :, :])
+
+        return np.any(np.all(diff <= scale, axis=2), axis=1)
+
+    def propose_batch(self, q, pending=None, strategy='believer',
+                      tol=1e-3):
+        """
+        Propose q points to evaluate concurrently.
+
+        Each proposed point, and each point still being evaluated, is
+        added to a copy of the GP with a fantasized value before the next
+        point is chosen: the GP mean for the Kriging believer
+        ('believer'), or the best observed value for the constant liar
+        ('liar'). The GP itself is left untouched.
+
+        Candidates within tol of a sampled, pending or already proposed
+        point are rejected, so near convergence the batch holds no
+        duplicate evaluations; it is cut short once every candidate is
+        rejected.
+
+        Args:
+            q: number of points to propose
+            pending: points already dispatched whose values are unknown
+            strategy: 'believer' or 'liar'
+            tol: distance below which two points are the same, as a
+                 fraction of the range of each dimension
+
+        Returns:
+            X_batch: (n, d) with n <= q distinct points
+        """
+        if strategy not in ('believer', 'liar'):
+            raise ValueError("strategy must be 'believer' or 'liar'")
+
+        gp = self.gp
+        self.gp = copy.deepcopy(gp)
+        batch = []
+
+        try:
+            for X_p in (pending if pending is not None else []):
+                self.fantasize(X_p, strategy)
+
+            for _ in range(q):
+                # The fantasized GP holds every sampled, pending and
+                # proposed point
+                X_next, _ = self.acquisition(self.gp.X, tol)
+                if X_next is None:
+                    break
+                batch.append(X_next)
+                self.fantasize(X_next, strategy)
+        finally:
+            self.gp = gp
+
+        return np.array(batch).reshape(-1, self.bounds.shape[0])
+
+    def fantasize(self, X, strategy):
+        """
+        Add a point with a fantasized value to the GP.
+
+        Args:
+            X: point (d,)
+            strategy: 'believer' or 'liar'
+        """
+        if strategy == 'believer':
+            Y = self.gp.predict(X.reshape(1, -1))[0]
+        elif self.minimize:
+            Y = np.min(self.gp.Y)
+        else:
+            Y = np.max(self.gp.Y)
+
+        self.gp.update(X, np.asarray(Y).reshape(1))
+
+    def is_sampled(self, X, others=()):
+        """
+        Check whether a point was already sampled or dispatched.
+
+        Args:
+            X: point (d,)
+            others: points dispatched but not yet added to the GP
+
+        Returns:
+            True if X matches any of those points
+        """
+        X_all = np.vstack([self.gp.X] + [np.reshape(o, (1, -1))
+                                         for o in others])
+        return np.any(np.all(np.abs(X_all - X) < 1e-8, axis=1))
+
+    def best(self):
+        """
+        Best sample found so far.
+
+        Returns:
+            X_opt: best input found (d,)
+            Y_opt: best value found (1,)
+        """
+        if self.minimize:
+            idx = np.argmin(self.gp.Y)
+        else:
+            idx = np.argmax(self.gp.Y)
+
+        return self.gp.X[idx].reshape(-1), self.gp.Y[idx].reshape(1)
+
+    def evaluate(self, X):
+        """
+        Evaluate f at X, reusing the value stored in the study if any.
+
+        Args:
+            X: point (d,)
+
+        Returns:
+            Y: value of f at X
+        """
+        if self.study is not None:
+            Y = self.study.get(X)
+            if Y is not None:
+                return Y
+
+        Y, duration = timed(self.f, X)
+        self.record(X, Y, duration)
+
+        return Y
+
+    def record(self, X, Y, duration):
+        """
+        Store an evaluation in the study, if there is one.
+
+        Args:
+            X: point (d,)
+            Y: value of f at X
+            duration: wall-clock time of the evaluation in seconds
+        """
+        if self.study is not None:
+            self.study.add(X, Y, duration)
+
     def optimize(self, iterations=100):
         """
         Run Bayesian Optimization loop.
@@ -69,22 +365,86 @@ class BayesianOptimization:
             iterations: max number of steps
 
         Returns:
-            X_opt: best input found (1,)
+            X_opt: best input found (d,)
             Y_opt: best value found (1,)
         """
         for _ in range(iterations):
             X_next, _ = self.acquisition()
 
             # stop if already sampled
-            if np.any(np.abs(self.gp.X - X_next) < 1e-8):
+            if self.is_sampled(X_next):
                 break
 
-            Y_next = self.f(X_next)
+            Y_next = self.evaluate(X_next)
             self.gp.update(X_next, Y_next)
 
-        if self.minimize:
-            idx = np.argmin(self.gp.Y)
-        else:
-            idx = np.argmax(self.gp.Y)
+        return self.best()
+
+    def optimize_batch(self, iterations=100, batch_size=8, executor=None,
+                       strategy='believer'):
+        """
+        Run Bayesian Optimization with up to batch_size concurrent
+        evaluations of f.
+
+        Evaluations are asynchronous: as soon as one finishes, its value
+        is added to the GP and a new point is proposed against the points
+        still in flight, so no worker waits for the slowest of a batch.
+
+        Args:
+            iterations: max number of evaluations of f
+            batch_size: max number of evaluations in flight
+            executor: concurrent.futures.Executor running f, e.g. a
+                      ProcessPoolExecutor for CPU-bound f; a thread pool
+                      with batch_size workers is used when None
+            strategy: fantasization strategy, 'believer' or 'liar'
+
+        Returns:
+            X_opt: best input found (d,)
+            Y_opt: best value found (1,)
+        """
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=batch_size)
+
+        pending = {}
+        submitted = 0
+        stop = False
+
+        try:
+            while True:
+                while (not stop and submitted < iterations
+                       and len(pending) < batch_size):
+                    X_batch = self.propose_batch(
+                        1, list(pending.values()), strategy)
+
+                    # stop once every candidate was sampled or is in flight
+                    if len(X_batch) == 0:
+                        stop = True
+                        break
+                    X_next = X_batch[0]
+
+                    submitted += 1
+
+                    Y_cached = (self.study.get(X_next)
+                                if self.study is not None else None)
+                    if Y_cached is not None:
+                        self.gp.update(X_next, Y_cached)
+                        continue
+
+                    future = executor.submit(timed, self.f, X_next)
+                    pending[future] = X_next
+
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    X_done = pending.pop(future)
+                    Y_done, duration = future.result()
+                    self.record(X_done, Y_done, duration)
+                    self.gp.update(X_done, np.asarray(Y_done))
+        finally:
+            if own_executor:
+                executor.shutdown()
 
-        return self.gp.X[idx].reshape(1), self.gp.Y[idx].reshape(1)
+        return self.best()
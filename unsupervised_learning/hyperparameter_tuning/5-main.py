@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import numpy as np
+
+BayesianOptimization = __import__('5-bayes_opt').BayesianOptimization
+
+
+def f(x):
+    """Our 'black box' function"""
+    return np.sin(5 * x) + 2 * np.sin(-2 * x)
+
+
+np.random.seed(0)
+X_init = np.random.uniform(-np.pi, 2 * np.pi, (2, 1))
+Y_init = f(X_init)
+
+bo = BayesianOptimization(f, X_init, Y_init, (-np.pi, 2 * np.pi), 50,
+                          l=0.6, sigma_f=2, xsi=0.05, n_restarts=4, seed=0)
+bo.optimize(30)
+
+# Near convergence, the batch must still hold distinct, unsampled points
+tol = 1e-3 * 3 * np.pi
+for strategy in ('believer', 'liar'):
+    X_batch = bo.propose_batch(8, strategy=strategy)
+    gaps = np.abs(X_batch[:, np.newaxis] - X_batch[np.newaxis]).max(axis=2)
+    np.fill_diagonal(gaps, np.inf)
+    print(strategy, len(X_batch), np.all(gaps > tol),
+          not np.any(bo.is_near(X_batch, bo.gp.X, 1e-3)))
+
+# With only 5 candidates, the batch stops once all of them are taken
+bo = BayesianOptimization(f, X_init, Y_init, (-np.pi, 2 * np.pi), 5,
+                          l=0.6, sigma_f=2, xsi=0.05)
+X_batch = bo.propose_batch(10)
+print(len(X_batch), len(np.unique(X_batch)))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Persistent evaluation store for Bayesian optimization studies."""
+
+import json
+import os
+
+import numpy as np
+
+
+class Study:
+    """Append-only JSON Lines store of the evaluations of a study."""
+
+    def __init__(self, path):
+        """
+        Open a study, reloading the evaluations already stored in it.
+
+        Args:
+            path: path of the JSON Lines file, created on first write
+        """
+        self.path = path
+        self.records = []
+        self.cache = {}
+
+        if os.path.exists(path):
+            with open(path) as f:
+                content = f.read()
+
+            # drop a partial record left by a crash mid-write so that the
+            # next append starts on a fresh line
+            end = content.rfind('\n') + 1
+            if end < len(content):
+                os.truncate(path, len(content[:end].encode()))
+
+            for line in content[:end].splitlines():
+                if line.strip():
+                    self._remember(json.loads(line))
+
+    @staticmethod
+    def key(X):
+        """
+        Hashable key of a point.
+
+        Args:
+            X: point (d,)
+
+        Returns:
+            tuple of the coordinates of X
+        """
+        return tuple(float(v) for v in np.ravel(X))
+
+    def _remember(self, record):
+        """Add a record to the in-memory index."""
+        self.records.append(record)
+        self.cache[self.key(record['x'])] = np.array(record['y'])
+
+    def get(self, X):
+        """
+        Stored value of a point.
+
+        Args:
+            X: point (d,)
+
+        Returns:
+            Y: stored value (1,), or None if X was never evaluated
+        """
+        return self.cache.get(self.key(X))
+
+    def add(self, X, Y, duration):
+        """
+        Record an evaluation and append it to the file.
+
+        Args:
+            X: point (d,)
+            Y: value of f at X (1,)
+            duration: wall-clock time of the evaluation in seconds
+        """
+        record = {
+            'x': [float(v) for v in np.ravel(X)],
+            'y': [float(v) for v in np.ravel(Y)],
+            'duration': float(duration)
+        }
+
+        with open(self.path, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._remember(record)
+
+    def observations(self):
+        """
+        All stored evaluations.
+
+        Returns:
+            X: (n, d), or None if the study is empty
+            Y: (n, 1), or None if the study is empty
+        """
+        if not self.records:
+            return None, None
+
+        X = np.array([r['x'] for r in self.records])
+        Y = np.array([r['y'] for r in self.records]).reshape(-1, 1)
+
+        return X, Y